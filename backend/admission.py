@@ -0,0 +1,161 @@
+import os
+import re
+import math
+import time
+import heapq
+import threading
+from collections import deque
+
+# --- ADMISSION CONTROL ---
+# Limits how many /chat requests run the pipeline at once. Extra requests wait
+# in a bounded priority queue; when the queue is full or a request has waited
+# too long it is shed with 503 + Retry-After instead of piling up on Gemini.
+# Messages that look like emergencies (the cases KARIN_PROMPT treats as top
+# priority) jump to the front of the queue and are never shed for a full queue.
+
+EMERGENCY = 0
+NORMAL = 1
+
+MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+
+# Cheap local pre-classifier (English + Indonesian). A match moves the request up
+# the queue and adds an emergency-services hint if it is shed, so it only looks
+# for unambiguous symptoms: swelling counts only for the face, lips, tongue or
+# throat ("swelling" alone is a routine question about painkillers).
+EMERGENCY_PATTERN = re.compile(
+    r"chest pain|pain in (?:my|the) chest|tight(?:ness)? (?:in )?(?:my )?chest|"
+    r"(?:difficulty|trouble|hard) breathing|can'?t breathe|cannot breathe|short(?:ness)? of breath|"
+    r"swell(?:ing|ed)? (?:of|in) (?:my |the )?(?:face|lips?|tongue|throat)|"
+    r"(?:face|lips?|tongue|throat) (?:is |are |got |has |have )?(?:been )?swell(?:ing|ed|s)?|"
+    r"faint(?:ed|ing)?|passed out|unconscious|seizure|anaphyla|overdos|suicid|"
+    r"nyeri dada|sakit dada|dada (?:sesak|sakit|nyeri)|sesak (?:napas|nafas)|susah (?:bernapas|bernafas|napas|nafas)|"
+    r"sulit (?:bernapas|bernafas)|bengkak (?:di |pada )?(?:wajah|muka|bibir|lidah|tenggorokan)|"
+    r"(?:wajah|muka|bibir|lidah|tenggorokan)(?:ku| saya)? (?:jadi )?bengkak|"
+    r"pingsan|tidak sadar|kejang|overdosis|bunuh diri",
+    re.IGNORECASE
+)
+
+
+def classify_priority(message):
+    """EMERGENCY for messages mentioning emergency symptoms, otherwise NORMAL."""
+    return EMERGENCY if message and EMERGENCY_PATTERN.search(message) else NORMAL
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_queue=MAX_QUEUE, max_wait=MAX_WAIT_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []   # heap of [priority, seq, cancelled]
+        self._queued = 0     # live (not cancelled) waiters
+        self._seq = 0
+
+        self._wait_times = deque(maxlen=500)
+        self._service_times = deque(maxlen=100)
+        self.stats = {
+            "admitted": 0,
+            "admitted_emergency": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "max_queue_depth": 0,
+        }
+
+    def _retry_after(self):
+        # Caller holds the lock. Rough time until a slot frees up for a new arrival.
+        service = sum(self._service_times) / len(self._service_times) if self._service_times else 5.0
+        return max(1, math.ceil(service * (self._queued + 1) / self.max_concurrent))
+
+    def _drop_cancelled(self):
+        while self._waiting and self._waiting[0][2]:
+            heapq.heappop(self._waiting)
+
+    def acquire(self, priority=NORMAL, timeout=None):
+        """Blocks until a slot is free. Raises AdmissionRejected when shed. Returns the seconds waited."""
+        timeout = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        start = time.monotonic()
+        with self._cond:
+            if self._active < self.max_concurrent and not self._queued:
+                return self._admit(priority, start)
+
+            if self._queued >= self.max_queue and priority != EMERGENCY:
+                self.stats["rejected_queue_full"] += 1
+                raise AdmissionRejected("queue_full", self._retry_after())
+
+            self._seq += 1
+            entry = [priority, self._seq, False]
+            heapq.heappush(self._waiting, entry)
+            self._queued += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._queued)
+
+            while not (self._waiting[0] is entry and self._active < self.max_concurrent):
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    entry[2] = True
+                    self._queued -= 1
+                    self._drop_cancelled()
+                    self._cond.notify_all()
+                    self.stats["rejected_timeout"] += 1
+                    raise AdmissionRejected("queue_timeout", self._retry_after())
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._queued -= 1
+            self._drop_cancelled()
+            waited = self._admit(priority, start)
+            # Another slot may be free for the next waiter too
+            self._cond.notify_all()
+            return waited
+
+    def _admit(self, priority, start):
+        # Caller holds the lock
+        self._active += 1
+        waited = time.monotonic() - start
+        self._wait_times.append(waited)
+        self.stats["admitted"] += 1
+        if priority == EMERGENCY:
+            self.stats["admitted_emergency"] += 1
+        return waited
+
+    def release(self, service_time=None):
+        with self._cond:
+            self._active -= 1
+            if service_time is not None:
+                self._service_times.append(service_time)
+            self._cond.notify_all()
+
+    def run(self, fn, priority=NORMAL, timeout=None):
+        """Runs fn() inside an admission slot."""
+        self.acquire(priority, timeout)
+        start = time.monotonic()
+        try:
+            return fn()
+        finally:
+            self.release(time.monotonic() - start)
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["active"] = self._active
+            stats["queue_depth"] = self._queued
+            waits = sorted(self._wait_times)
+        stats["max_concurrent"] = self.max_concurrent
+        stats["max_queue"] = self.max_queue
+        if waits:
+            stats["wait_avg_ms"] = round(sum(waits) / len(waits) * 1000, 2)
+            stats["wait_p95_ms"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2)
+        return stats
+
+
+admission = AdmissionController()
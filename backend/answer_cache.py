@@ -0,0 +1,158 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from drug_names import canonical_key
+from admission import classify_priority, EMERGENCY
+
+# --- ANSWER CACHE ---
+# Many first-turn questions are the same question from different users ("is it
+# safe to take X with Y"). For a user's first question the final reply is cached
+# under what the pipeline resolved (language, intent and the canonical drug
+# set) rather than the raw text, so differently worded questions share an entry.
+# The user's name is stored as a placeholder and filled back in when served.
+#
+# Only intents whose answer depends on the drugs alone are cached, and only
+# when at least one drug was resolved and no stage was skipped for time. A
+# question that adds who is taking it or how (pregnancy, age, dose, kidney or
+# liver problems, ...) is not about the drugs alone, so it is never cached.
+# Neither is one that describes symptoms or a reaction the user is having: an
+# emergency must get the ER instruction KARIN_PROMPT requires, and a reply
+# written for an emergency must not be served to a routine question.
+#
+# The frontend opens every session with a greeting exchange, so "first question"
+# means the history holds at most that opening user turn (plus Karin's replies);
+# anything later may lean on earlier context and is never served from cache.
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "500"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+CACHEABLE_INTENTS = {"asking_about_interactions", "checking_safety"}
+
+USER_NAME_PLACEHOLDER = "{{user_name}}"
+
+# Population, dose and condition qualifiers (English and Indonesian)
+QUALIFIER_PATTERN = re.compile(
+    r"(?<!-)\b(?:"
+    r"pregnan\w*|hamil|breast-?feeding|nursing|menyusui|"
+    r"bab(?:y|ies)|infants?|bayi|toddlers?|balita|child(?:ren)?|kids?|anak(?:-anak)?|teen\w*|remaja|"
+    r"elderly|seniors?|lansia|manula|"
+    r"\d+\s*-?\s*(?:years?|yrs?|months?|tahun|thn|bulan)(?:\s*-?\s*old)?|"
+    r"\d+(?:[.,]\d+)?\s*(?:mg|mcg|g|ml|iu)|doses?|dosage|dosis|overdos\w*|"
+    r"kidneys?|renal|ginjal|liver|hepatic|hati|"
+    r"allerg\w*|alergi|asthma|asma|diabet\w*|hypertension|hipertensi|blood pressure|tekanan darah|darah tinggi|"
+    r"heart|jantung|ulcers?|maag|lambung|surgery|operasi|alcohol\w*|alkohol"
+    r")\b(?!-)",
+    re.IGNORECASE
+)
+
+# Symptom and adverse-event wording beyond the emergency classifier (English and Indonesian)
+SYMPTOM_PATTERN = re.compile(
+    r"\b(?:"
+    r"bleed\w*|blood in|bruis\w*|rash\w*|hives|itch\w*|swell\w*|vomit\w*|throw(?:ing)? up|nause\w*|"
+    r"dizz\w*|headaches?|diarrh\w*|fever|pain|hurts?|sick|side effects?|reactions?|symptoms?|"
+    r"pendarahan|perdarahan|berdarah|memar|ruam|biduran|gatal|bengkak|muntah|mual|pusing|sakit kepala|diare|"
+    r"demam|nyeri|sakit|efek samping|reaksi|gejala"
+    r")\b",
+    re.IGNORECASE
+)
+
+
+def is_first_question(history):
+    """True when the chat history holds no user turn beyond the opening greeting."""
+    user_turns = [turn for turn in history or [] if isinstance(turn, dict) and turn.get("role") == "user"]
+    return len(user_turns) <= 1
+
+
+def has_qualifiers(user_message):
+    return bool(user_message) and QUALIFIER_PATTERN.search(user_message) is not None
+
+
+def describes_symptoms(user_message):
+    """True for emergencies (the admission classifier) and any other symptom or reaction wording."""
+    if not user_message:
+        return False
+    return classify_priority(user_message) == EMERGENCY or SYMPTOM_PATTERN.search(user_message) is not None
+
+
+def answer_cache_key(metadata, language, user_message=None):
+    """Key for a first-turn reply, or None if this request must not be served from cache."""
+    if not isinstance(metadata, dict) or metadata.get("intent") not in CACHEABLE_INTENTS:
+        return None
+    if has_qualifiers(user_message) or describes_symptoms(user_message):
+        return None
+    if metadata.get("degraded_stages") or metadata.get("unchecked_drugs"):
+        return None
+    names = metadata.get("found_drugs", []) + metadata.get("not_found_drugs", []) + metadata.get("ingredient_found_drugs", [])
+    drug_keys = sorted({canonical_key(name) for name in names if name} - {""})
+    if not drug_keys:
+        return None
+    return f"{language}|{metadata['intent']}|{'+'.join(drug_keys)}"
+
+
+def _name_pattern(user_name):
+    return re.compile(r"(?<!\w)" + re.escape(user_name) + r"(?!\w)")
+
+
+def depersonalize(text, user_name):
+    if not user_name or not user_name.strip():
+        return text
+    return _name_pattern(user_name.strip()).sub(USER_NAME_PLACEHOLDER, text)
+
+
+def personalize(text, user_name):
+    return text.replace(USER_NAME_PLACEHOLDER, (user_name or "").strip() or "there")
+
+
+class AnswerCache:
+    """LRU of (message, emotion) with a TTL. max_entries=0 disables it."""
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def get(self, key, user_name=None):
+        """Returns (message, emotion) personalized for user_name, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            message, emotion, stored_at = entry
+            if self.clock() - stored_at > self.ttl:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        return personalize(message, user_name), emotion
+
+    def set(self, key, message, emotion, user_name=None):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (depersonalize(message, user_name), emotion, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+
+answer_cache = AnswerCache()
@@ -1,25 +1,94 @@
 import os
+import hmac
+import atexit
+import signal
 import requests
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
-from core_logic import get_karin_response, KARIN_PROMPT
-from metrics import get_metrics
+from core_logic import get_karin_response, is_error_reply, KARIN_PROMPT, query_cache, warm_up_cache
+from answer_cache import answer_cache, is_first_question
+from medication_profile import session_profiles
+from metrics import get_metrics, metrics_history, RESOLUTIONS
+from database import neo4j_breaker, get_graph_version, get_all_drug_names
+from drug_suggest import DrugSuggester
+from graph_version import GraphVersionWatcher
+from conversation_log import conversation_logger, build_chat_record
+from cache_warmup import start_warmup, save_snapshot, warmup_state
+from deadline import Deadline
+from admission import admission, classify_priority, AdmissionRejected, EMERGENCY
+from static_assets import StaticAssets
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 
+# Autocomplete index over all Drug names and known aliases, built in the background
+# (and retried on later lookups while it only holds fallback names)
+drug_suggester = DrugSuggester(lambda: get_all_drug_names(with_status=True))
+
+# Drop cached graph data, answers and session profiles (and rebuild the autocomplete index) when import_data.py stamps a new graph version
+graph_watcher = GraphVersionWatcher(query_cache, get_graph_version,
+                                    on_change=[lambda version: drug_suggester.rebuild_in_background(),
+                                               lambda version: answer_cache.clear(),
+                                               lambda version: session_profiles.clear()])
+
+# `python app.py` runs with the Werkzeug reloader
+USE_RELOADER = True
+
+
+def is_reloader_parent():
+    """True in the reloader's watcher process, which re-runs this file in a child and never serves requests."""
+    return __name__ == '__main__' and USE_RELOADER and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+
+
+def start_background_work():
+    # --- CACHE WARM-UP ---
+    # Restore the last cache snapshot and pre-load popular lookups in the background;
+    # /ready reports 503 until this finishes. The cache is snapshotted again on shutdown.
+    start_warmup(query_cache, warm_up_cache)
+    atexit.register(save_snapshot, query_cache)
+    drug_suggester.rebuild_in_background()
+    graph_watcher.start(wait_for=warmup_state.ready)
+
+
+# Only the serving process warms, snapshots and watches the cache (the reloader parent
+# would repeat the warm-up calls and race the child's snapshot on exit)
+if not is_reloader_parent():
+    start_background_work()
+
+# Replies sent when a /chat request is shed by admission control (503 + Retry-After)
+BUSY_MESSAGES = {
+    "en": "<b>I'm answering a lot of questions right now.</b> Please send your message again in about {seconds} seconds.",
+    "id": "<b>Karin sedang menjawab banyak pertanyaan.</b> Silakan kirim ulang pesanmu sekitar {seconds} detik lagi.",
+}
+# Added for messages the pre-classifier flags as possible emergencies; a suggestion, not a diagnosis
+EMERGENCY_HINTS = {
+    "en": "If you have chest pain, trouble breathing or swelling of the face or throat, please consider contacting emergency services.",
+    "id": "Jika kamu mengalami nyeri dada, sesak napas, atau bengkak di wajah atau tenggorokan, pertimbangkan untuk menghubungi layanan darurat.",
+}
+
+def admin_authorized():
+    """Admin endpoints need ADMIN_TOKEN to be configured and sent as X-Admin-Token."""
+    token = os.getenv("ADMIN_TOKEN")
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(token) and hmac.compare_digest(token, supplied)
+
 @app.route('/chat', methods=['POST'])
 def chat():
+    # Time budget for the whole request, shared by every pipeline stage
+    deadline = Deadline()
+
     data = request.json
     user_message = data.get('message', '')
     history_from_frontend = data.get('history', []) 
     language = data.get('language', 'en')
     user_name = data.get('userName', 'User')
 
-    drug_list = data.get('drugList', [])
+    # None when the client does not send a list; a list (even empty) replaces the session's medications
+    drug_list = data.get('drugList')
+    profile = session_profiles.get(data.get('sessionId'))
 
     if not user_message.strip():
         user_message = "..."
@@ -30,11 +99,34 @@ def chat():
     system_prompt = {'role': 'user', 'parts': [system_prompt_text]}
     full_history = [system_prompt] + history_from_frontend
 
-    # Call Karin Logic
-    message, emotion = get_karin_response(user_message, full_history, language, drug_list)
+    # Call Karin Logic behind admission control; emergencies go to the front of the queue
+    priority = classify_priority(user_message)
+    extras = {}
+    try:
+        message, emotion = admission.run(
+            lambda: get_karin_response(user_message, full_history, language, drug_list, deadline,
+                                       user_name=user_name, first_turn=is_first_question(history_from_frontend), profile=profile,
+                                       extras=extras),
+            priority=priority,
+            timeout=deadline.remaining()
+        )
+    except AdmissionRejected as e:
+        print(f"Shedding /chat request ({e.reason}), retry after {e.retry_after}s")
+        messages = [BUSY_MESSAGES.get(language, BUSY_MESSAGES["en"]).format(seconds=e.retry_after)]
+        if priority == EMERGENCY:
+            messages.append(EMERGENCY_HINTS.get(language, EMERGENCY_HINTS["en"]))
+        body = {"messages": messages, "emotion": "concerned", "retry_after": e.retry_after}
+        return jsonify(body), 503, {"Retry-After": str(e.retry_after)}
     
     messages = [m.strip() for m in message.split('||')]
-    response = {"messages": messages, "emotion": emotion}
+    # Interactions left out of the prompt's token budget, so the client can list them
+    response = {"messages": messages, "emotion": emotion, "omitted_interactions": extras.get("omitted_interactions", [])}
+
+    # Capture the exchange for dataset generation (non-blocking, disabled unless configured);
+    # error replies from Gemini outages are not training data
+    if conversation_logger and not is_error_reply(message):
+        conversation_logger.log(build_chat_record(user_message, messages, emotion, language, drug_list or [], len(history_from_frontend)))
+
     return jsonify(response)
 
 # --- ENDPOINT BARU UNTUK TEXT-TO-SPEECH ---
@@ -80,10 +172,101 @@ def generate_audio():
         print(f"Error calling ElevenLabs API: {e}")
         return jsonify({"error": "Failed to generate audio"}), 500
 
+@app.route('/drugs/suggest', methods=['GET'])
+def suggest_drugs():
+    query = request.args.get('q', '')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+    except ValueError:
+        limit = 10
+    return jsonify({"query": query, "suggestions": drug_suggester.suggest(query, limit)})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    status = warmup_state.to_dict()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+@app.route('/admin/cache', methods=['GET'])
+def admin_cache():
+    if not admin_authorized():
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify({
+        "backend": query_cache.backend.name,
+        "namespaces": query_cache.get_stats(),
+        "descriptions": query_cache.store.get_stats() if query_cache.store else None,
+        "answers": answer_cache.get_stats(),
+        "graph": graph_watcher.to_dict(),
+    })
+
+@app.route('/admin/cache/invalidate', methods=['POST'])
+def admin_cache_invalidate():
+    if not admin_authorized():
+        return jsonify({"error": "Unauthorized"}), 403
+    data = request.json or {}
+
+    if data.get('drug'):
+        removed = query_cache.invalidate_drug(data['drug'])
+        answer_cache.clear()  # Cached answers are keyed on drug sets; dropping them all is cheap
+        return jsonify({"invalidated": "drug", "drug": data['drug'], "entries_removed": removed})
+
+    namespace = data.get('namespace')
+    if namespace:
+        if namespace not in query_cache.stats:
+            return jsonify({"error": f"Unknown namespace '{namespace}'"}), 400
+        query_cache.invalidate_namespaces([namespace])
+        answer_cache.clear()
+        return jsonify({"invalidated": "namespace", "namespace": namespace})
+
+    if data.get('all'):
+        query_cache.clear()
+        answer_cache.clear()
+        return jsonify({"invalidated": "all"})
+
+    return jsonify({"error": "Provide 'drug', 'namespace' or 'all'"}), 400
+
 @app.route('/metrics', methods=['GET'])
 def metrics():
-    return jsonify(get_metrics())
+    data = dict(get_metrics())
+    for key, value in neo4j_breaker.get_stats().items():
+        data[f"neo4j_circuit_{key}"] = value
+    for key, value in admission.get_stats().items():
+        data[f"admission_{key}"] = value
+    if conversation_logger:
+        for key, value in conversation_logger.get_stats().items():
+            data[f"conversation_log_{key}"] = value
+    return jsonify(data)
+
+
+@app.route('/metrics/history', methods=['GET'])
+def metrics_history_route():
+    resolution = request.args.get('resolution', '1m')
+    if resolution not in RESOLUTIONS:
+        return jsonify({"error": f"Unknown resolution '{resolution}', use one of {', '.join(RESOLUTIONS)}"}), 400
+    try:
+        points = int(request.args.get('points', 60))
+    except ValueError:
+        return jsonify({"error": "'points' must be an integer"}), 400
+    return jsonify(metrics_history.history(resolution, points))
+
+
+# --- FRONTEND ---
+# Serves frontend/ with the AVIF/WebP and brotli/gzip variants from build_assets.py
+static_assets = StaticAssets()
+
+@app.route('/asset-versions', methods=['GET'])
+def asset_versions():
+    return jsonify(static_assets.versions())
+
+@app.route('/', defaults={'path': 'index.html'}, methods=['GET'])
+@app.route('/<path:path>', methods=['GET'])
+def frontend(path):
+    response = static_assets.response(path, request)
+    if response is None:
+        return jsonify({"error": "Not found"}), 404
+    return response
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=8000)
+    # Turn SIGTERM into a normal exit so the atexit snapshot still runs
+    signal.signal(signal.SIGTERM, lambda signum, frame: exit(0))
+    app.run(debug=True, port=8000, use_reloader=USE_RELOADER)
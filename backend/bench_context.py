@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the context-building pipeline at realistic graph sizes.
+
+Generates a synthetic drug graph, loads it into the database fallback tables
+(so no Neo4j or Gemini access is needed) and sweeps:
+  * number of drugs
+  * number of interaction edges
+  * medications per request
+  * cache hit ratio
+
+For every combination it reports per-function timings (median / p95) and
+allocations (peak bytes and allocated blocks from tracemalloc), so scaling
+curves can be tracked over time by appending the JSONL output.
+
+Usage:
+    python bench_context.py --quick
+    python bench_context.py --drugs 1000 10000 50000 --edges-per-drug 10 --output bench.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+import contextlib
+
+# core_logic refuses to import without a key; the benchmark never calls Gemini.
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import database
+import core_logic
+from core_logic import QueryCache, query_cache
+
+
+# --- SYNTHETIC GRAPH GENERATOR ---
+def generate_graph(num_drugs, num_edges, seed=0):
+    """
+    Builds a synthetic drug graph shaped like the mock tables in database.py.
+    Names are fixed-width so the substring matching used by the fallback
+    lookups never produces accidental partial matches.
+    Returns (drugs_dict, interactions_list, adjacency).
+    """
+    rng = random.Random(seed)
+    width = len(str(num_drugs))
+    names = [f"Drug{i:0{width}d}" for i in range(1, num_drugs + 1)]
+    drugs = {name: {"id": i + 1, "name": name} for i, name in enumerate(names)}
+
+    max_edges = num_drugs * (num_drugs - 1) // 2
+    num_edges = min(num_edges, max_edges)
+
+    interactions = []
+    adjacency = {name: [] for name in names}
+    seen_pairs = set()
+    while len(interactions) < num_edges:
+        a, b = rng.sample(range(num_drugs), 2)
+        pair = (a, b) if a < b else (b, a)
+        if pair in seen_pairs:
+            continue
+        seen_pairs.add(pair)
+        drug_a, drug_b = names[pair[0]], names[pair[1]]
+        interactions.append({
+            "drug_a": drug_a,
+            "drug_b": drug_b,
+            "description": f"{drug_a} may increase the adverse effects of {drug_b}."
+        })
+        adjacency[drug_a].append(drug_b)
+        adjacency[drug_b].append(drug_a)
+
+    return drugs, interactions, adjacency
+
+
+def sample_medication_list(names, adjacency, size, rng):
+    """
+    Picks a medication list that looks like a real request: a seed drug plus
+    some of its interaction partners, topped up with random drugs.
+    """
+    seed_drug = rng.choice(names)
+    meds = [seed_drug]
+    partners = list(adjacency.get(seed_drug, []))
+    rng.shuffle(partners)
+    for partner in partners:
+        if len(meds) >= size // 2 + 1:
+            break
+        meds.append(partner)
+    while len(meds) < size:
+        candidate = rng.choice(names)
+        if candidate not in meds:
+            meds.append(candidate)
+    return meds
+
+
+@contextlib.contextmanager
+def synthetic_database(drugs, interactions):
+    """
+    Swaps the database fallback tables for the synthetic graph. The credentials are
+    cleared too, so queries never reconnect to a configured Neo4j instance.
+    """
+    saved = (database.uri, database.user, database.password, database.driver,
+             database.MOCK_DRUGS, database.MOCK_INTERACTIONS)
+    database.uri = database.user = database.password = None
+    database.driver = None
+    database.MOCK_DRUGS = drugs
+    database.MOCK_INTERACTIONS = interactions
+    try:
+        yield
+    finally:
+        (database.uri, database.user, database.password, database.driver,
+         database.MOCK_DRUGS, database.MOCK_INTERACTIONS) = saved
+
+
+@contextlib.contextmanager
+def offline_gemini(extracted_drugs):
+    """
+    Replaces the Gemini-backed helpers in core_logic with instant local stubs.
+    `extracted_drugs` is a list the caller may refill between calls.
+    """
+    saved = (core_logic.extract_drugs_from_message, core_logic.get_ingredients_from_gemini)
+    core_logic.extract_drugs_from_message = lambda message, deadline=None: {
+        "drugs_mentioned": list(extracted_drugs),
+        "intent": "asking_about_interactions",
+        "query_context": ""
+    }
+    core_logic.get_ingredients_from_gemini = lambda drug_name, deadline=None: []
+    try:
+        yield
+    finally:
+        core_logic.extract_drugs_from_message, core_logic.get_ingredients_from_gemini = saved
+
+
+# --- MEASUREMENT ---
+def measure(cases, repeats):
+    """
+    Runs each (setup, call) case `repeats` times. Only `call` is timed.
+    Allocation figures come from one extra traced run so tracemalloc
+    overhead does not leak into the timings.
+    """
+    timings = []
+    devnull = open(os.devnull, "w")
+    try:
+        with contextlib.redirect_stdout(devnull):
+            for _ in range(repeats):
+                for setup, call in cases:
+                    args = setup()
+                    start = time.perf_counter()
+                    call(*args)
+                    timings.append(time.perf_counter() - start)
+
+            setup, call = cases[0]
+            args = setup()
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            call(*args)
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        devnull.close()
+
+    allocated_blocks = sum(max(stat.count_diff, 0) for stat in after.compare_to(before, "lineno"))
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        "peak_bytes": peak,
+        "allocated_blocks": allocated_blocks,
+    }
+
+
+def prefill_cache(drug_names, hit_ratio, rng):
+    """Clears the global cache and warms it for roughly `hit_ratio` of the names."""
+    query_cache.clear()
+    for name in drug_names:
+        if rng.random() < hit_ratio:
+            data = database.MOCK_DRUGS.get(name)
+            if data:
+                cached = data.copy()
+                cached["ingredients"] = []
+                query_cache.set_drug(name, cached)
+
+
+def bench_combination(drugs, adjacency, meds_per_request, hit_ratio, requests, repeats, seed):
+    """Benchmarks every pipeline function for one sweep point."""
+    rng = random.Random(seed)
+    names = list(drugs.keys())
+    med_lists = [sample_medication_list(names, adjacency, meds_per_request, rng) for _ in range(requests)]
+    found_lists = [[drugs[n] for n in meds] for meds in med_lists]
+    results = {}
+
+    # search_drugs_in_database
+    def search_setup(meds):
+        def setup():
+            prefill_cache(meds, hit_ratio, rng)
+            return (meds,)
+        return setup
+    results["search_drugs_in_database"] = measure(
+        [(search_setup(meds), core_logic.search_drugs_in_database) for meds in med_lists], repeats)
+
+    # check_interactions_for_drugs
+    def interactions_setup(found):
+        def setup():
+            query_cache.clear()
+            if rng.random() < hit_ratio:
+                core_logic.check_interactions_for_drugs(found)
+            return (found,)
+        return setup
+    results["check_interactions_for_drugs"] = measure(
+        [(interactions_setup(found), core_logic.check_interactions_for_drugs) for found in found_lists], repeats)
+
+    # QueryCache get/set round trips in isolation
+    def cache_roundtrip(meds):
+        cache = QueryCache()
+        for name in meds:
+            if cache.get_drug(name) is None:
+                cache.set_drug(name, drugs[name])
+        for name in meds:
+            cache.get_drug(name)
+    results["QueryCache"] = measure([(lambda meds=meds: (meds,), cache_roundtrip) for meds in med_lists], repeats)
+
+    # build_database_context end-to-end (Gemini stubbed out)
+    extracted = []
+    def context_case(meds):
+        half = len(meds) // 2
+        def setup():
+            prefill_cache(meds, hit_ratio, rng)
+            extracted[:] = meds[:half]
+            return ("Is it safe to take these together?", meds[half:])
+        return setup, core_logic.build_database_context
+    with offline_gemini(extracted):
+        results["build_database_context"] = measure([context_case(meds) for meds in med_lists], repeats)
+
+    return results
+
+
+def run_sweep(args):
+    rows = []
+    for num_drugs in args.drugs:
+        for edges_per_drug in args.edges_per_drug:
+            num_edges = num_drugs * edges_per_drug
+            drugs, interactions, adjacency = generate_graph(num_drugs, num_edges, seed=args.seed)
+            with synthetic_database(drugs, interactions):
+                for meds in args.meds:
+                    for hit_ratio in args.hit_ratios:
+                        results = bench_combination(
+                            drugs, adjacency, meds, hit_ratio, args.requests, args.repeats, args.seed)
+                        for function_name, stats in results.items():
+                            row = {
+                                "timestamp": time.time(),
+                                "function": function_name,
+                                "drugs": num_drugs,
+                                "edges": len(interactions),
+                                "meds_per_request": meds,
+                                "hit_ratio": hit_ratio,
+                            }
+                            row.update(stats)
+                            rows.append(row)
+                            print_row(row)
+            query_cache.clear()
+    return rows
+
+
+def print_row(row):
+    print(f"{row['function']:<30} drugs={row['drugs']:<7} edges={row['edges']:<8} "
+          f"meds={row['meds_per_request']:<3} hit={row['hit_ratio']:<4} "
+          f"median={row['median_ms']:9.3f}ms p95={row['p95_ms']:9.3f}ms "
+          f"peak={row['peak_bytes']:>9}B blocks={row['allocated_blocks']}")
+    sys.stdout.flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling micro-benchmarks for build_database_context and friends.")
+    parser.add_argument("--drugs", type=int, nargs="+", default=[1000, 10000, 30000])
+    parser.add_argument("--edges-per-drug", type=int, nargs="+", default=[2, 10])
+    parser.add_argument("--meds", type=int, nargs="+", default=[2, 5, 10, 20])
+    parser.add_argument("--hit-ratios", type=float, nargs="+", default=[0.0, 0.5, 0.9])
+    parser.add_argument("--requests", type=int, default=10, help="Distinct medication lists per sweep point")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the medication lists")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Append results as JSON lines to this file")
+    parser.add_argument("--quick", action="store_true", help="Small sweep for smoke testing")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.drugs = [500, 2000]
+        args.edges_per_drug = [5]
+        args.meds = [2, 10]
+        args.hit_ratios = [0.0, 0.9]
+        args.requests = 5
+        args.repeats = 2
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    rows = run_sweep(args)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        print(f"Wrote {len(rows)} rows to {args.output}")
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import gzip
+import hashlib
+import argparse
+
+# --- STATIC ASSET BUILD ---
+# Generates the precompressed / re-encoded variants that static_assets.py serves:
+#   images (.png/.jpg/.jpeg) -> resized .avif and .webp copies
+#   text (.html/.css/.js/...) -> .br and .gz copies
+# plus a manifest.json with the content hash of every source file and variant.
+#
+# Optional dependencies: Pillow (image variants, AVIF needs Pillow >= 11.2 or
+# pillow-avif-plugin) and brotli (.br files). Missing ones are skipped.
+#
+#   python build_assets.py [--max-size 800] [--quality 70]
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend"))
+BUILD_DIRNAME = "build"
+MANIFEST_NAME = "manifest.json"
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+TEXT_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".txt"}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def avif_supported():
+    if Image is None:
+        return False
+    try:
+        if features.check("avif"):
+            return True
+    except Exception:
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+        return True
+    except ImportError:
+        return False
+
+
+def iter_sources(root, build_dir):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != build_dir and not d.startswith(".")]
+        for filename in sorted(filenames):
+            ext = os.path.splitext(filename)[1].lower()
+            if ext in IMAGE_EXTENSIONS or ext in TEXT_EXTENSIONS:
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), path, ext
+
+
+def build_image_variants(source, rel_path, build_dir, max_size, quality, with_avif):
+    variants = []
+    with Image.open(source) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "P") else "RGB")
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        stem = os.path.splitext(rel_path)[0]
+        targets = [("image/webp", stem + ".webp", "WEBP", {"quality": quality, "method": 6})]
+        if with_avif:
+            targets.insert(0, ("image/avif", stem + ".avif", "AVIF", {"quality": quality}))
+
+        for mimetype, rel_variant, fmt, options in targets:
+            out_path = os.path.join(build_dir, rel_variant)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            img.save(out_path, fmt, **options)
+            variants.append({"file": rel_variant, "type": mimetype,
+                             "hash": file_hash(out_path), "size": os.path.getsize(out_path)})
+    return variants
+
+
+def build_text_encodings(source, rel_path, build_dir):
+    with open(source, "rb") as f:
+        data = f.read()
+    encodings = {}
+    outputs = [("gzip", rel_path + ".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        outputs.insert(0, ("br", rel_path + ".br", lambda d: brotli.compress(d, quality=11)))
+
+    for encoding, rel_variant, compress in outputs:
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            continue  # Not worth serving
+        out_path = os.path.join(build_dir, rel_variant)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "wb") as f:
+            f.write(compressed)
+        encodings[encoding] = {"file": rel_variant, "size": len(compressed)}
+    return encodings
+
+
+def build(root=FRONTEND_DIR, max_size=800, quality=70, force=False):
+    build_dir = os.path.join(root, BUILD_DIRNAME)
+    os.makedirs(build_dir, exist_ok=True)
+    manifest_path = os.path.join(build_dir, MANIFEST_NAME)
+
+    previous = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f).get("assets", {})
+
+    with_avif = avif_supported()
+    if Image is None:
+        print("Pillow not installed: skipping image variants (pip install Pillow)")
+    elif not with_avif:
+        print("AVIF encoder not available: generating WebP only")
+    if brotli is None:
+        print("brotli not installed: generating gzip only (pip install brotli)")
+
+    assets = {}
+    rebuilt = 0
+    for rel_path, source, ext in iter_sources(root, build_dir):
+        entry = {"hash": file_hash(source), "size": os.path.getsize(source), "variants": [], "encodings": {}}
+        old = previous.get(rel_path)
+        if old and old.get("hash") == entry["hash"] and all(
+                os.path.exists(os.path.join(build_dir, v["file"])) for v in old.get("variants", []) + list(old.get("encodings", {}).values())):
+            assets[rel_path] = old
+            continue
+
+        if ext in IMAGE_EXTENSIONS and Image is not None:
+            entry["variants"] = build_image_variants(source, rel_path, build_dir, max_size, quality, with_avif)
+        elif ext in TEXT_EXTENSIONS:
+            entry["encodings"] = build_text_encodings(source, rel_path, build_dir)
+        assets[rel_path] = entry
+        rebuilt += 1
+
+        smallest = min([entry["size"]] + [v["size"] for v in entry["variants"]] + [e["size"] for e in entry["encodings"].values()])
+        print(f"  {rel_path}: {entry['size'] // 1024} KB -> {smallest // 1024} KB")
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "assets": assets}, f, indent=1, sort_keys=True)
+    print(f"Built {rebuilt} of {len(assets)} assets into {build_dir}")
+    return assets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate precompressed and resized frontend assets")
+    parser.add_argument("--root", default=FRONTEND_DIR, help="Frontend directory")
+    parser.add_argument("--max-size", type=int, default=800, help="Longest image side in pixels")
+    parser.add_argument("--quality", type=int, default=70, help="WebP/AVIF quality")
+    parser.add_argument("--force", action="store_true", help="Rebuild everything, ignoring the previous manifest")
+    args = parser.parse_args(argv)
+    build(args.root, args.max_size, args.quality, args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
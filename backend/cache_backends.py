@@ -0,0 +1,354 @@
+import os
+import json
+import socket
+import sqlite3
+import threading
+from urllib.parse import urlparse
+
+# --- CACHE BACKENDS ---
+# Storage behind QueryCache. With several worker processes an in-process dict
+# is duplicated per worker, so the same lookups can be shared through SQLite
+# (one file on the local machine) or any Redis-protocol server instead.
+#
+# Every backend stores JSON-serialized values under (namespace, key) and
+# supports batch get/set so a request with N drugs costs one round trip.
+#
+# Select with CACHE_BACKEND=memory|sqlite|redis (see create_backend_from_env).
+
+
+def serialize(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def deserialize(data):
+    if data is None:
+        return None
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+class CacheBackend:
+    """Interface shared by all cache backends."""
+
+    name = "base"
+
+    def get(self, namespace, key):
+        return self.get_many(namespace, [key]).get(key)
+
+    def set(self, namespace, key, value):
+        self.set_many(namespace, {key: value})
+
+    def get_many(self, namespace, keys):
+        """Returns {key: value} for the keys that are present."""
+        raise NotImplementedError
+
+    def set_many(self, namespace, mapping):
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def items(self, namespace):
+        """Returns all (key, value) pairs in a namespace."""
+        raise NotImplementedError
+
+    def size(self, namespace):
+        return len(self.items(namespace))
+
+    def clear(self, namespace=None):
+        raise NotImplementedError
+
+
+class InMemoryBackend(CacheBackend):
+    """Per-process dictionaries (the original QueryCache behaviour)."""
+
+    name = "memory"
+
+    def __init__(self):
+        self.data = {}
+
+    def _ns(self, namespace):
+        return self.data.setdefault(namespace, {})
+
+    def get(self, namespace, key):
+        return self._ns(namespace).get(key)
+
+    def set(self, namespace, key, value):
+        self._ns(namespace)[key] = value
+
+    def get_many(self, namespace, keys):
+        store = self._ns(namespace)
+        return {key: store[key] for key in keys if key in store}
+
+    def set_many(self, namespace, mapping):
+        self._ns(namespace).update(mapping)
+
+    def delete(self, namespace, key):
+        self._ns(namespace).pop(key, None)
+
+    def items(self, namespace):
+        return list(self._ns(namespace).items())
+
+    def size(self, namespace):
+        return len(self._ns(namespace))
+
+    def clear(self, namespace=None):
+        if namespace is None:
+            self.data.clear()
+        else:
+            self._ns(namespace).clear()
+
+
+class SQLiteBackend(CacheBackend):
+    """Shared local store: one SQLite file (WAL mode) used by every worker on the machine."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, namespace, keys):
+        keys = list(keys)
+        result = {}
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn().execute(
+                f"SELECT key, value FROM cache WHERE namespace = ? AND key IN ({placeholders})",
+                [namespace] + chunk
+            )
+            for key, value in rows:
+                result[key] = deserialize(value)
+        return result
+
+    def set_many(self, namespace, mapping):
+        if not mapping:
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (namespace, key, value) VALUES (?, ?, ?)",
+                [(namespace, key, serialize(value)) for key, value in mapping.items()]
+            )
+
+    def delete(self, namespace, key):
+        self._conn().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def items(self, namespace):
+        rows = self._conn().execute("SELECT key, value FROM cache WHERE namespace = ?", (namespace,))
+        return [(key, deserialize(value)) for key, value in rows]
+
+    def size(self, namespace):
+        return self._conn().execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    def clear(self, namespace=None):
+        if namespace is None:
+            self._conn().execute("DELETE FROM cache")
+        else:
+            self._conn().execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend(CacheBackend):
+    """
+    Minimal Redis-protocol (RESP) client; works with Redis, Valkey, KeyDB or a local stand-in.
+    Keys are stored as "<prefix>:<namespace>:<key>". Connection errors are logged and
+    treated as cache misses so an unavailable cache never fails a request.
+    """
+
+    name = "redis"
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, prefix="karin", timeout=1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url, prefix="karin"):
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, db, parsed.password, prefix)
+
+    # --- RESP protocol ---
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._call_unlocked("AUTH", self.password)
+        if self.db:
+            self._call_unlocked("SELECT", self.db)
+
+    def _disconnect(self):
+        for closable in (self._reader, self._sock):
+            try:
+                if closable:
+                    closable.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    @staticmethod
+    def _encode(args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count == -1:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def _call_unlocked(self, *args):
+        self._sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def _pipeline(self, commands):
+        """Sends several commands in one write and reads all replies. Reconnects once on failure."""
+        payload = b"".join(self._encode(cmd) for cmd in commands)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall(payload)
+                    return [self._read_reply() for _ in commands]
+                except (OSError, ConnectionError) as e:
+                    self._disconnect()
+                    if attempt == 1:
+                        raise ConnectionError(f"Cache server unavailable: {e}")
+
+    def call(self, *args):
+        return self._pipeline([args])[0]
+
+    # --- CacheBackend interface ---
+    def _key(self, namespace, key):
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def get_many(self, namespace, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = self.call("MGET", *[self._key(namespace, k) for k in keys])
+        except (ConnectionError, RedisError) as e:
+            print(f"Cache backend read failed: {e}")
+            return {}
+        return {k: deserialize(v) for k, v in zip(keys, values) if v is not None}
+
+    def set_many(self, namespace, mapping):
+        if not mapping:
+            return
+        args = []
+        for key, value in mapping.items():
+            args.extend([self._key(namespace, key), serialize(value)])
+        try:
+            self.call("MSET", *args)
+        except (ConnectionError, RedisError) as e:
+            print(f"Cache backend write failed: {e}")
+
+    def delete(self, namespace, key):
+        try:
+            self.call("DEL", self._key(namespace, key))
+        except (ConnectionError, RedisError) as e:
+            print(f"Cache backend delete failed: {e}")
+
+    def _scan_keys(self, pattern):
+        keys = []
+        cursor = b"0"
+        while True:
+            cursor, batch = self.call("SCAN", cursor, "MATCH", pattern, "COUNT", 1000)
+            keys.extend(batch)
+            if cursor in (b"0", "0"):
+                return keys
+
+    def items(self, namespace):
+        prefix = self._key(namespace, "")
+        try:
+            keys = self._scan_keys(prefix + "*")
+            if not keys:
+                return []
+            values = self.call("MGET", *keys)
+        except (ConnectionError, RedisError) as e:
+            print(f"Cache backend scan failed: {e}")
+            return []
+        return [(k.decode("utf-8")[len(prefix):], deserialize(v)) for k, v in zip(keys, values) if v is not None]
+
+    def size(self, namespace):
+        try:
+            return len(self._scan_keys(self._key(namespace, "") + "*"))
+        except (ConnectionError, RedisError):
+            return 0
+
+    def clear(self, namespace=None):
+        pattern = f"{self.prefix}:*" if namespace is None else self._key(namespace, "") + "*"
+        try:
+            keys = self._scan_keys(pattern)
+            for start in range(0, len(keys), 1000):
+                self.call("DEL", *keys[start:start + 1000])
+        except (ConnectionError, RedisError) as e:
+            print(f"Cache backend clear failed: {e}")
+
+
+def create_backend_from_env():
+    """Builds the backend selected by CACHE_BACKEND (memory, sqlite or redis)."""
+    kind = os.getenv("CACHE_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        path = os.getenv("CACHE_SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_cache.sqlite"))
+        print(f"Using shared SQLite cache at {path}")
+        return SQLiteBackend(path)
+    if kind == "redis":
+        url = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+        print(f"Using Redis cache at {url}")
+        return RedisBackend.from_url(url, prefix=os.getenv("CACHE_REDIS_PREFIX", "karin"))
+    return InMemoryBackend()
@@ -0,0 +1,154 @@
+import os
+import gzip
+import json
+import time
+import threading
+from collections import Counter
+
+# --- CACHE WARM-UP & SNAPSHOTS ---
+# Tracks which drugs, drug sets and brands are requested most, writes QueryCache
+# contents plus those statistics to a compact gzip snapshot on shutdown, and
+# restores them on boot so a fresh deploy does not start with an empty cache.
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = os.getenv(
+    "CACHE_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_snapshot.json.gz")
+)
+DEFAULT_WARMUP_TOP_N = int(os.getenv("CACHE_WARMUP_TOP_N", "50"))
+
+
+class AccessStats:
+    """Bounded access counters for drugs, drug sets (interaction cache keys) and brands."""
+
+    CATEGORIES = ("drugs", "pairs", "brands")
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self.counters = {category: Counter() for category in self.CATEGORIES}
+
+    def record(self, category, key):
+        if not key:
+            return
+        with self._lock:
+            counter = self.counters[category]
+            counter[key] += 1
+            # Keep memory bounded: drop the long tail once the table gets too big
+            if len(counter) > self.max_keys:
+                self.counters[category] = Counter(dict(counter.most_common(self.max_keys // 2)))
+
+    def record_drug(self, key):
+        self.record("drugs", key)
+
+    def record_pair(self, key):
+        self.record("pairs", key)
+
+    def record_brand(self, key):
+        self.record("brands", key)
+
+    def top(self, category, n):
+        with self._lock:
+            return [key for key, _ in self.counters[category].most_common(n)]
+
+    def to_dict(self):
+        with self._lock:
+            return {category: dict(counter) for category, counter in self.counters.items()}
+
+    def load_dict(self, data):
+        with self._lock:
+            for category in self.CATEGORIES:
+                self.counters[category].update(data.get(category, {}))
+
+
+# Global stats instance (recorded by core_logic)
+access_stats = AccessStats()
+
+
+def save_snapshot(cache, stats=access_stats, path=DEFAULT_SNAPSHOT_PATH):
+    """Writes cache contents and access statistics to a gzip JSON snapshot (atomic replace)."""
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "created": time.time(),
+        "cache": cache.export_state(),
+        "access_stats": stats.to_dict(),
+    }
+    # Per-process temp file: workers shutting down together must not write into the same one
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        print(f"Cache snapshot saved to {path}")
+        return True
+    except Exception as e:
+        print(f"Failed to save cache snapshot: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def load_snapshot(cache, stats=access_stats, path=DEFAULT_SNAPSHOT_PATH):
+    """Restores a snapshot written by save_snapshot. Returns the number of cache entries restored."""
+    if not os.path.exists(path):
+        return 0
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            print(f"Ignoring cache snapshot with unsupported version {snapshot.get('version')}")
+            return 0
+        restored = cache.import_state(snapshot.get("cache", {}))
+        stats.load_dict(snapshot.get("access_stats", {}))
+        print(f"Restored {restored} cache entries from snapshot")
+        return restored
+    except Exception as e:
+        print(f"Failed to load cache snapshot: {e}")
+        return 0
+
+
+class WarmupState:
+    """Readiness flag for the warm-up thread, reported by the /ready endpoint."""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self.restored_entries = 0
+        self.warmed = {}
+
+    def to_dict(self):
+        return {
+            "ready": self.ready.is_set(),
+            "restored_entries": self.restored_entries,
+            "warmed": self.warmed,
+            "duration_seconds": (self.finished_at - self.started_at) if self.finished_at else None,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def start_warmup(cache, warm_fn, top_n=DEFAULT_WARMUP_TOP_N, path=DEFAULT_SNAPSHOT_PATH, background=True):
+    """
+    Restores the snapshot and then runs `warm_fn(top_n)` (which should return a summary dict),
+    marking warmup_state ready once both are done.
+    """
+    def run():
+        warmup_state.started_at = time.time()
+        try:
+            warmup_state.restored_entries = load_snapshot(cache, path=path)
+            if top_n > 0:
+                warmup_state.warmed = warm_fn(top_n)
+        except Exception as e:
+            print(f"Cache warm-up failed: {e}")
+        finally:
+            warmup_state.finished_at = time.time()
+            warmup_state.ready.set()
+
+    if background:
+        thread = threading.Thread(target=run, name="cache-warmup", daemon=True)
+        thread.start()
+        return thread
+    run()
+    return None
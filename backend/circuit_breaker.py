@@ -0,0 +1,114 @@
+import time
+import threading
+
+# --- CIRCUIT BREAKER ---
+# Stops calling a dependency that keeps failing (e.g. a paused Neo4j Aura instance)
+# so callers fall back immediately instead of waiting for a timeout on every call.
+#
+#   closed    -> calls go through; `failure_threshold` consecutive failures open the circuit
+#   open      -> calls are refused until `reset_timeout` seconds have passed
+#   half_open -> up to `half_open_max_calls` probe calls are let through;
+#                a success closes the circuit, a failure opens it again
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.stats = {
+            "successes": 0,
+            "failures": 0,
+            "short_circuited": 0,
+            "times_opened": 0,
+            "ignored": 0,
+        }
+        self.last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        # Caller holds the lock
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+
+    def _open(self):
+        # Caller holds the lock
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self.stats["times_opened"] += 1
+        print(f"⚠️ Circuit '{self.name}' OPEN: using fallback for {self.reset_timeout:.0f}s")
+
+    def allow_request(self):
+        """Returns True if the caller may try the dependency now. Every allowed call must be
+        followed by record_success(), record_failure() or record_ignored()."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+            self.stats["short_circuited"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.stats["successes"] += 1
+            self._consecutive_failures = 0
+            if self._state != CLOSED:
+                print(f"✅ Circuit '{self.name}' closed: dependency is healthy again")
+            self._state = CLOSED
+            self._probes_in_flight = 0
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.stats["failures"] += 1
+            self._consecutive_failures += 1
+            if error is not None:
+                self.last_error = str(error)
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def record_ignored(self):
+        """Ends an allowed call without judging the dependency (e.g. the caller's own deadline ran out)."""
+        with self._lock:
+            self.stats["ignored"] += 1
+            if self._state == HALF_OPEN and self._probes_in_flight > 0:
+                # Let another probe decide instead
+                self._probes_in_flight -= 1
+
+    def force_open(self, error=None):
+        """Opens the circuit immediately (e.g. the initial connection failed)."""
+        with self._lock:
+            if error is not None:
+                self.last_error = str(error)
+            self._open()
+
+    def get_stats(self):
+        with self._lock:
+            self._maybe_half_open()
+            stats = dict(self.stats)
+            stats["state"] = self._state
+            stats["consecutive_failures"] = self._consecutive_failures
+            if self._state == OPEN:
+                stats["retry_in_seconds"] = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            stats["last_error"] = self.last_error
+            return stats
@@ -0,0 +1,142 @@
+import os
+from drug_names import canonical_key
+
+# --- CONTEXT ASSEMBLER ---
+# Ranks interaction lines and fits them into a token budget before they are
+# injected into the Gemini prompt. Everything that does not fit is returned
+# to the caller as structured data instead of being silently dropped.
+
+# Default budget for the whole injected context (roughly 4 characters per token)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# Severity keywords, checked against the lowercased description. Highest tier wins.
+SEVERITY_KEYWORDS = [
+    (3, ["fatal", "death", "life-threatening", "contraindicated", "serotonin syndrome",
+         "qtc", "qt prolongation", "arrhythmia", "torsade", "bleeding", "hemorrhage",
+         "haemorrhage", "respiratory depression", "cardiotoxic", "neuroleptic malignant",
+         "hypertensive crisis", "rhabdomyolysis", "seizure"]),
+    (2, ["anticoagulant", "toxicity", "hypotension", "hypoglycemia", "hyperkalemia",
+         "nephrotoxic", "hepatotoxic", "cns depressant", "adverse effects", "risk or severity"]),
+    (1, ["serum concentration", "metabolism", "absorption", "bioavailability",
+         "excretion", "efficacy", "therapeutic"]),
+]
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for budgeting."""
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+
+def severity_of(description):
+    """Returns 0-3 based on severity keywords in the interaction description."""
+    desc = (description or "").lower()
+    for level, keywords in SEVERITY_KEYWORDS:
+        for keyword in keywords:
+            if keyword in desc:
+                return level
+    return 0
+
+
+def pair_key(interaction):
+    """Order-independent, synonym-aware key for an interaction pair."""
+    a = canonical_key(interaction.get('drug_a'))
+    b = canonical_key(interaction.get('drug_b'))
+    return (a, b) if a <= b else (b, a)
+
+
+def rank_interactions(interactions, mentioned_drugs=None):
+    """
+    Deduplicates interactions by synonym-aware pair and sorts them by priority:
+      1. severity keywords in the description
+      2. how many of the pair were mentioned in the current message
+      3. original order (stable)
+    Returns a list of (interaction, score_dict) tuples.
+    """
+    mentioned = {canonical_key(d) for d in (mentioned_drugs or []) if d}
+    seen_pairs = set()
+    ranked = []
+
+    for position, interaction in enumerate(interactions):
+        key = pair_key(interaction)
+        if key in seen_pairs:
+            continue
+        seen_pairs.add(key)
+
+        severity = severity_of(interaction.get('description'))
+        mention_hits = sum(1 for drug in key if drug in mentioned)
+        ranked.append((interaction, {
+            "severity": severity,
+            "mentioned": mention_hits,
+            "position": position,
+        }))
+
+    ranked.sort(key=lambda item: (-item[1]["severity"], -item[1]["mentioned"], item[1]["position"]))
+    return ranked
+
+
+def render_interaction(interaction):
+    drug_a = interaction.get('drug_a', '')
+    drug_b = interaction.get('drug_b', '')
+    desc = interaction.get('description', '')
+    return f"<li><b>{drug_a}</b> + <b>{drug_b}</b>: {desc}</li>"
+
+
+def assemble_interaction_sections(sections, mentioned_drugs=None, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Fits several interaction sections into a shared token budget.
+
+    `sections` is a list of (header, interactions) tuples, in display order.
+    Interactions from all sections are ranked together so the most important
+    lines survive, then rendered back under their original headers.
+
+    Returns (context_parts, overflow) where context_parts is a list of strings
+    ready to append to the prompt and overflow is a list of dicts describing
+    every interaction that did not fit. Duplicate pairs are dropped.
+    """
+    candidates = []
+    for section_index, (header, interactions) in enumerate(sections):
+        for interaction in interactions:
+            candidates.append((section_index, interaction))
+
+    ranked = rank_interactions([c[1] for c in candidates], mentioned_drugs)
+    section_of = {}
+    for section_index, interaction in candidates:
+        section_of.setdefault(id(interaction), section_index)
+
+    kept = [[] for _ in sections]
+    overflow = []
+    remaining = token_budget
+    # Reserve room for the section headers and list wrappers
+    for header, interactions in sections:
+        if interactions:
+            remaining -= estimate_tokens(header) + 4
+
+    for interaction, score in ranked:
+        line = render_interaction(interaction)
+        cost = estimate_tokens(line)
+        if cost <= remaining:
+            kept[section_of[id(interaction)]].append((score["position"], line))
+            remaining -= cost
+        else:
+            overflow.append({
+                "drug_a": interaction.get('drug_a', ''),
+                "drug_b": interaction.get('drug_b', ''),
+                "description": interaction.get('description', ''),
+                "severity": score["severity"],
+            })
+
+    context_parts = []
+    for (header, _), lines in zip(sections, kept):
+        if lines:
+            lines.sort()
+            context_parts.append(f"{header}\n<ul>{''.join(line for _, line in lines)}</ul>")
+
+    if overflow:
+        context_parts.append(
+            f"[NOTE] {len(overflow)} additional lower-priority interaction(s) were omitted to keep this summary short. "
+            "Tell the user more interactions exist and that they can ask about a specific pair."
+        )
+
+    return context_parts, overflow
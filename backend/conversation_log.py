@@ -0,0 +1,179 @@
+import os
+import gzip
+import json
+import time
+import queue
+import shutil
+import atexit
+import threading
+
+# --- CONVERSATION LOG SINK ---
+# Captures /chat exchanges as JSONL for dataset generation without adding latency:
+# the request thread only does a non-blocking put() on a bounded queue, and a
+# background thread batches records to disk, rotating files by size or age.
+# When the queue is full, records are dropped and counted instead of blocking.
+#
+# File names carry the process id, so with several worker processes each one
+# appends to and rotates only its own file.
+
+class ConversationLogger:
+    """Bounded, non-blocking JSONL writer with size/time rotation and optional gzip."""
+
+    def __init__(self, log_dir, base_name="conversations", max_queue=10000, batch_size=200,
+                 flush_interval=1.0, max_bytes=50 * 1024 * 1024, max_age_seconds=3600, compress=True):
+        self.log_dir = log_dir
+        self.base_name = base_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.compress = compress
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._file = None
+        self._file_opened_at = 0.0
+        self._file_bytes = 0
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "write_errors": 0,
+            "rotations": 0,
+        }
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="conversation-log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def current_path(self):
+        return os.path.join(self.log_dir, f"{self.base_name}-{os.getpid()}.jsonl")
+
+    def log(self, record):
+        """Queues a record for writing. Never blocks; returns False if the record was dropped."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._bump("dropped")
+            return False
+        self._bump("enqueued")
+        return True
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+    def close(self, timeout=5.0):
+        """Stops the writer thread after draining the queue."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _bump(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    # --- background thread ---
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write_batch(batch)
+            elif self._file and self._should_rotate():
+                self._rotate()
+        self._close_file()
+
+    def _next_batch(self):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            except (TypeError, ValueError):
+                self._bump("write_errors")
+        if not lines:
+            return
+        data = "".join(lines).encode("utf-8")
+        try:
+            if self._file is None:
+                self._open_file()
+            self._file.write(data)
+            self._file.flush()
+            self._file_bytes += len(data)
+            self._bump("written", len(lines))
+        except OSError as e:
+            print(f"Conversation log write failed: {e}")
+            self._bump("write_errors", len(lines))
+            return
+        if self._should_rotate():
+            self._rotate()
+
+    def _open_file(self):
+        self._file = open(self.current_path, "ab")
+        self._file_bytes = self._file.tell()
+        self._file_opened_at = time.time()
+
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _should_rotate(self):
+        if self._file_bytes >= self.max_bytes:
+            return True
+        return self._file_bytes > 0 and time.time() - self._file_opened_at >= self.max_age_seconds
+
+    def _rotate(self):
+        self._close_file()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        rotated = os.path.join(self.log_dir, f"{self.base_name}-{os.getpid()}-{stamp}-{self.stats['rotations']}.jsonl")
+        try:
+            os.replace(self.current_path, rotated)
+            if self.compress:
+                with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(rotated)
+            self._bump("rotations")
+        except OSError as e:
+            print(f"Conversation log rotation failed: {e}")
+
+
+def build_chat_record(user_message, messages, emotion, language='en', drug_list=None, history_turns=0):
+    """Shapes a /chat exchange like the fine-tuning samples (input_text / output_text)."""
+    return {
+        "timestamp": time.time(),
+        "language": language,
+        "input_text": user_message,
+        "output_text": f"[{emotion}]: " + " || ".join(messages),
+        "emotion": emotion,
+        "drug_list": list(drug_list or []),
+        "history_turns": history_turns,
+    }
+
+
+# Global logger instance. Disabled unless CONVERSATION_LOG_DIR is set.
+conversation_logger = None
+if os.getenv("CONVERSATION_LOG_DIR"):
+    conversation_logger = ConversationLogger(
+        os.getenv("CONVERSATION_LOG_DIR"),
+        max_queue=int(os.getenv("CONVERSATION_LOG_QUEUE", "10000")),
+        max_bytes=int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+        max_age_seconds=int(os.getenv("CONVERSATION_LOG_MAX_AGE", "3600")),
+        compress=os.getenv("CONVERSATION_LOG_COMPRESS", "1") != "0",
+    )
+    atexit.register(conversation_logger.close)
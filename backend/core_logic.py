@@ -2,57 +2,246 @@ import os
 import re
 import json
 import time
+import hashlib
+import threading
+from collections import OrderedDict
 import google.generativeai as genai
 from dotenv import load_dotenv
 # Pastikan database.py ada. Jika belum setup DB, comment baris di bawah ini.
-from database import get_drug_interactions_from_db, get_drug_by_name, get_drug_ingredients, get_brand_drugs, search_drugs_by_keyword
-from metrics import update_metrics
+from database import get_drug_interactions_from_db, get_interactions_involving, get_drug_by_name, get_drug_ingredients, get_brand_drugs, search_drugs_by_keyword
+from metrics import update_metrics, record_cache_lookups
+from drug_names import canonical_key, canonicalize_drug_list, brand_ingredients
+from cache_warmup import access_stats
+from cache_backends import InMemoryBackend, create_backend_from_env
+from deadline import ensure_deadline, MIN_REPLY_SECONDS
+from stage_graph import StageGraph
+from context_assembler import assemble_interaction_sections, estimate_tokens, DEFAULT_TOKEN_BUDGET
+from answer_cache import answer_cache, answer_cache_key
+from description_store import description_store
 
 # --- CACHING LAYER ---
 class QueryCache:
-    """Simple in-memory cache for database and API queries to reduce redundant lookups"""
-    def __init__(self):
-        self.drug_cache = {}  # Cache for drug lookups
-        self.ingredients_cache = {}  # Cache for ingredient extractions from Gemini
-        self.interactions_cache = {}  # Cache for interaction queries
+    """
+    Cache for database and API queries to reduce redundant lookups.
+    Drug and ingredient keys are canonicalized (see drug_names.py) so synonyms share one entry.
+    Storage is pluggable (see cache_backends.py) so worker processes can share one cache.
+    """
+    # Snapshot section name -> backend namespace
+    NAMESPACES = {
+        "drug_cache": "drug",  # Cache for drug lookups
+        "ingredients_cache": "ingredients",  # Cache for ingredient extractions from Gemini
+        "interactions_cache": "interactions",  # Cache for interaction queries
+        "meta_cache": "meta",  # Bookkeeping, e.g. the graph version the cache was built against
+    }
+
+    # Namespaces whose contents come from the graph (invalidated when the graph version changes)
+    GRAPH_NAMESPACES = ("drug", "interactions")
+
+    # Extraction results are keyed on free user text, so they stay in a small process-local LRU
+    # (hashed keys, TTL) instead of the shared backend and are never written to snapshots
+    EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "2000"))
+    EXTRACTION_CACHE_TTL_SECONDS = float(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", "3600"))
+
+    def __init__(self, backend=None, store=None):
+        self.backend = backend or InMemoryBackend()
+        # Process-local backends keep interactions as interned edge ids (see description_store.py)
+        self.store = (store or description_store) if isinstance(self.backend, InMemoryBackend) else None
+        # Per-process hit/miss counters per namespace
+        self.stats = {namespace: {"hits": 0, "misses": 0} for namespace in self.NAMESPACES.values()}
+        self.stats["extraction"] = {"hits": 0, "misses": 0}
+        self.extractions = OrderedDict()  # sha256(normalized message) -> (extracted, stored_at)
+        self._extraction_lock = threading.Lock()
+
+    def _count(self, namespace, hits, misses):
+        counters = self.stats[namespace]
+        counters["hits"] += hits
+        counters["misses"] += misses
+        record_cache_lookups(hits, misses)
+
+    def _get(self, namespace, key):
+        value = self.backend.get(namespace, key)
+        self._count(namespace, value is not None, value is None)
+        return value
     
     def get_drug(self, drug_name):
-        key = drug_name.lower()
-        return self.drug_cache.get(key)
+        key = canonical_key(drug_name)
+        return self._get("drug", key)
     
     def set_drug(self, drug_name, data):
-        key = drug_name.lower()
-        self.drug_cache[key] = data
+        key = canonical_key(drug_name)
+        self.backend.set("drug", key, data)
+
+    def get_drugs(self, drug_names):
+        """Batch lookup: returns {canonical_key: data} for the names that are cached"""
+        keys = {canonical_key(name) for name in drug_names}
+        found = self.backend.get_many("drug", keys)
+        self._count("drug", len(found), len(keys) - len(found))
+        return found
+
+    def set_drugs(self, drugs_by_name):
+        """Batch store of {drug_name: data}"""
+        self.backend.set_many("drug", {canonical_key(name): data for name, data in drugs_by_name.items()})
     
     def get_ingredients(self, drug_name):
-        key = drug_name.lower()
-        return self.ingredients_cache.get(key)
+        key = canonical_key(drug_name)
+        return self._get("ingredients", key)
     
     def set_ingredients(self, drug_name, ingredients):
-        key = drug_name.lower()
-        self.ingredients_cache[key] = ingredients
+        key = canonical_key(drug_name)
+        self.backend.set("ingredients", key, ingredients)
     
     def get_interactions(self, drug_names_key):
-        return self.interactions_cache.get(drug_names_key)
+        interactions = self._get("interactions", drug_names_key)
+        if interactions is not None and self.store:
+            rendered = self.store.render_many(interactions)
+            if rendered is None:
+                # Interned before the store was reset (a set racing a graph change); drop it
+                self.backend.delete("interactions", drug_names_key)
+            return rendered
+        return interactions
     
     def set_interactions(self, drug_names_key, interactions):
-        self.interactions_cache[drug_names_key] = interactions
+        if self.store:
+            interactions = self.store.intern_many(interactions)
+        self.backend.set("interactions", drug_names_key, interactions)
     
+    @staticmethod
+    def _extraction_key(message):
+        return hashlib.sha256(normalize_message(message).encode("utf-8")).hexdigest()
+
+    def get_extraction(self, message):
+        key = self._extraction_key(message)
+        with self._extraction_lock:
+            entry = self.extractions.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.EXTRACTION_CACHE_TTL_SECONDS:
+                del self.extractions[key]
+                entry = None
+            if entry is not None:
+                self.extractions.move_to_end(key)
+        self._count("extraction", entry is not None, entry is None)
+        return entry[0] if entry is not None else None
+
+    def set_extraction(self, message, extracted):
+        key = self._extraction_key(message)
+        with self._extraction_lock:
+            self.extractions[key] = (extracted, time.monotonic())
+            self.extractions.move_to_end(key)
+            while len(self.extractions) > self.EXTRACTION_CACHE_SIZE:
+                self.extractions.popitem(last=False)
+
+    def export_state(self):
+        """Returns all cached entries as plain dicts (used for snapshots)"""
+        state = {section: dict(self.backend.items(namespace)) for section, namespace in self.NAMESPACES.items()}
+        if self.store:
+            # Edge ids are only valid in this process, so snapshots carry the rendered text
+            rendered = {key: self.store.render_many(refs) for key, refs in state["interactions_cache"].items()}
+            state["interactions_cache"] = {key: value for key, value in rendered.items() if value is not None}
+        return state
+
+    def import_state(self, state):
+        """Merges entries produced by export_state(); returns how many were loaded"""
+        count = 0
+        for section, namespace in self.NAMESPACES.items():
+            entries = state.get(section) or {}
+            if namespace == "interactions" and self.store:
+                entries = {key: self.store.intern_many(interactions) for key, interactions in entries.items()}
+            self.backend.set_many(namespace, entries)
+            count += len(entries)
+        return count
+
     def clear(self):
         """Clear all caches"""
-        self.drug_cache.clear()
-        self.ingredients_cache.clear()
-        self.interactions_cache.clear()
+        self.invalidate_namespaces(list(self.NAMESPACES.values()) + ["extraction"])
+
+    def invalidate_namespaces(self, namespaces):
+        for namespace in namespaces:
+            if namespace == "extraction":
+                with self._extraction_lock:
+                    self.extractions.clear()
+            else:
+                self.backend.clear(namespace)
+                if namespace == "interactions" and self.store:
+                    # Graph data changed: start the interned descriptions over so they don't only grow
+                    self.store.reset()
+
+    def invalidate_drug(self, drug_name):
+        """
+        Drops every entry that mentions a drug: its lookup, ingredient breakdown and every
+        cached interaction set containing it. Returns the number of entries removed.
+        """
+        key = canonical_key(drug_name)
+        removed = 0
+        for namespace in ("drug", "ingredients"):
+            if self.backend.get(namespace, key) is not None:
+                self.backend.delete(namespace, key)
+                removed += 1
+        for set_key, _ in self.backend.items("interactions"):
+            if key in set_key.split("|"):
+                self.backend.delete("interactions", set_key)
+                removed += 1
+        return removed
+
+    def get_stats(self):
+        """Size and hit rate per namespace"""
+        result = {}
+        for namespace, counters in self.stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            result[namespace] = {
+                "size": len(self.extractions) if namespace == "extraction" else self.backend.size(namespace),
+                "hits": counters["hits"],
+                "misses": counters["misses"],
+                "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+            }
+        return result
+
+def normalize_message(message):
+    """Cache key for a user message: case, whitespace and trailing punctuation don't matter"""
+    return " ".join((message or "").lower().split()).strip(" .?!")
 
 # Global cache instance
-query_cache = QueryCache()
+query_cache = QueryCache(create_backend_from_env())
 
 # --- INITIAL SETUP ---
 load_dotenv()
+
+# Conversational replies use the main model; the structured calls (drug extraction and
+# ingredient breakdowns) go to a separately configurable, faster/cheaper tier.
+MODEL_NAME = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash-lite")
+STRUCTURED_MODEL_NAME = os.getenv("GEMINI_STRUCTURED_MODEL", MODEL_NAME)
+
+INTENTS = ["asking_about_interactions", "asking_about_side_effects", "asking_about_dosage", "checking_safety", "general_question"]
+
+# Response schemas force the structured calls to return parseable JSON
+EXTRACTION_CONFIG = genai.GenerationConfig(
+    temperature=0,
+    response_mime_type="application/json",
+    response_schema={
+        "type": "object",
+        "properties": {
+            "drugs_mentioned": {"type": "array", "items": {"type": "string"}},
+            "intent": {"type": "string", "format": "enum", "enum": INTENTS},
+            "query_context": {"type": "string"},
+        },
+        "required": ["drugs_mentioned", "intent"],
+    },
+)
+INGREDIENTS_CONFIG = genai.GenerationConfig(
+    temperature=0,
+    response_mime_type="application/json",
+    response_schema={
+        "type": "object",
+        "properties": {
+            "ingredients": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["ingredients"],
+    },
+)
+
 try:
     genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
     # Use gemini-2.5-flash for better compatibility
-    model = genai.GenerativeModel('models/gemini-2.5-flash-lite')
+    model = genai.GenerativeModel(MODEL_NAME)
+    structured_model = genai.GenerativeModel(STRUCTURED_MODEL_NAME)
     print("Gemini model configured successfully!")
 except KeyError:
     print("ERROR: GOOGLE_API_KEY not found. Please check your .env file.")
@@ -116,11 +305,17 @@ Start EVERY response with one of these tags to set your avatar's face:
 """
 
 # --- SAFE DRUG EXTRACTION (DATABASE ONLY) ---
-def extract_drugs_from_message(user_message):
+def extract_drugs_from_message(user_message, deadline=None):
     """
-    Uses Gemini to extract drug names mentioned in the user's message.
+    Uses Gemini (structured tier, JSON schema output) to extract drug names mentioned in the user's message.
     Returns only drugs that can be verified in the database.
+    Results are cached by normalized message text, so repeated questions skip the call.
     """
+    deadline = ensure_deadline(deadline)
+
+    cached_extraction = query_cache.get_extraction(user_message)
+    if cached_extraction is not None:
+        return cached_extraction
     # UPDATED PROMPT: Explicitly instructs normalization of synonyms
     extraction_prompt = """
     Analyze this user message and extract any drug/medicine names mentioned.
@@ -130,24 +325,20 @@ def extract_drugs_from_message(user_message):
     IMPORTANT RULES:
     1. Extract ONLY the drug names, not descriptions.
     2. **Normalize Synonyms:** If you see "Acetaminophen", convert it to "Paracetamol". If you see "Tylenol", keep it as "Tylenol" (it is a brand).
-    3. Return a JSON object with this structure:
-    {{
-        "drugs_mentioned": ["drug1", "drug2"],
-        "intent": "asking_about_interactions|asking_about_side_effects|asking_about_dosage|checking_safety|general_question",
-        "query_context": "brief description of what the user wants to know"
-    }}
+    3. Fill "drugs_mentioned", "intent" and "query_context" (brief description of what the user wants to know).
     
     If no drugs are mentioned, return empty drugs_mentioned list.
     """
     
     try:
-        response = model.generate_content(extraction_prompt.format(message=user_message))
-        response_text = response.text
-        
-        # Extract JSON from response
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
-        if json_match:
-            extracted_data = json.loads(json_match.group())
+        response = structured_model.generate_content(
+            extraction_prompt.format(message=user_message),
+            generation_config=EXTRACTION_CONFIG,
+            request_options=deadline.request_options()
+        )
+        extracted_data = parse_extraction(response.text)
+        if extracted_data is not None:
+            query_cache.set_extraction(user_message, extracted_data)
             return extracted_data
         
         return {"drugs_mentioned": [], "intent": "general_question", "query_context": ""}
@@ -161,57 +352,122 @@ def extract_drugs_from_message(user_message):
         
         return {"drugs_mentioned": [], "intent": "general_question", "query_context": ""}
 
-def search_drugs_in_database(drug_names):
+def _load_json_object(text):
+    """Parses the model's JSON reply; falls back to the first {...} block for non-conforming replies"""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        match = re.search(r'\{[\s\S]*\}', text or "")
+        if not match:
+            return None
+        try:
+            data = json.loads(match.group())
+        except ValueError:
+            return None
+    return data if isinstance(data, dict) else None
+
+def parse_extraction(text):
+    """Validates an extraction reply into {"drugs_mentioned", "intent", "query_context"} or None"""
+    data = _load_json_object(text)
+    if data is None:
+        return None
+    drugs = data.get("drugs_mentioned")
+    if not isinstance(drugs, list):
+        return None
+    intent = data.get("intent")
+    return {
+        "drugs_mentioned": [d.strip() for d in drugs if isinstance(d, str) and d.strip()],
+        "intent": intent if intent in INTENTS else "general_question",
+        "query_context": data.get("query_context") if isinstance(data.get("query_context"), str) else "",
+    }
+
+def parse_ingredients(text):
+    """Validates an ingredients reply into a list of names or None"""
+    data = _load_json_object(text)
+    if data is None or not isinstance(data.get("ingredients"), list):
+        return None
+    return [i.strip() for i in data["ingredients"] if isinstance(i, str) and i.strip()]
+
+def search_drugs_in_database(drug_names, deadline=None):
     """
     Searches database for multiple drug names and returns comprehensive data.
     Attempts to find exact matches first, then fuzzy matches.
-    Uses cache to avoid redundant lookups.
+    Names are canonicalized first, so synonyms and dosage variants share one lookup.
+    Uses cache to avoid redundant lookups (one batch read and one batch write per call).
+    Names that could not be looked up before the deadline are returned under "skipped".
     """
+    deadline = ensure_deadline(deadline)
     found_drugs = []
     not_found_drugs = []
+    skipped_drugs = []
+    new_cache_entries = {}
+
+    canonical_drugs = canonicalize_drug_list(drug_names)
+    cached_drugs = query_cache.get_drugs([drug_key for drug_key, _ in canonical_drugs])
     
-    for drug_name in drug_names:
+    for drug_key, drug_name in canonical_drugs:
+        access_stats.record_drug(drug_key)
+
         # Check cache first
-        cached_drug = query_cache.get_drug(drug_name)
+        cached_drug = cached_drugs.get(drug_key)
         if cached_drug is not None:
             found_drugs.append(cached_drug)
             continue
         
+        if not deadline.allows("db_lookup"):
+            skipped_drugs.append(drug_name)
+            continue
+
         # Try exact match from DB
-        drug_data = get_drug_by_name(drug_name)
+        drug_data, reliable = get_drug_by_name(drug_key, timeout=deadline.timeout(), with_status=True)
+        if not reliable:
+            deadline.skip("db_fallback")
         
         if drug_data:
             # Get ingredients if available
-            ingredients = get_drug_ingredients(drug_name)
+            ingredients = get_drug_ingredients(drug_key)
             drug_data['ingredients'] = ingredients
-            query_cache.set_drug(drug_name, drug_data)
+            # Fallback answers from a failed call are used for this request but never cached
+            if reliable:
+                new_cache_entries[drug_key] = drug_data
             found_drugs.append(drug_data)
+        elif not deadline.allows("fuzzy_search"):
+            # Optional enrichment: no time left for a fuzzy scan
+            not_found_drugs.append(drug_name)
         else:
             # Try keyword search for fuzzy matching
             try:
-                search_results = search_drugs_by_keyword(drug_name)
+                search_results, reliable = search_drugs_by_keyword(drug_key, timeout=deadline.timeout(), with_status=True)
+                if not reliable:
+                    deadline.skip("db_fallback")
                 if search_results:
                     for result in search_results:
                         ingredients = get_drug_ingredients(result['name'])
                         result['ingredients'] = ingredients
-                        query_cache.set_drug(result['name'], result)
+                        if reliable:
+                            new_cache_entries[result['name']] = result
                     found_drugs.extend(search_results)
                 else:
                     not_found_drugs.append(drug_name)
             except:
                 not_found_drugs.append(drug_name)
+
+    if new_cache_entries:
+        query_cache.set_drugs(new_cache_entries)
     
     return {
         "found": found_drugs,
-        "not_found": not_found_drugs
+        "not_found": not_found_drugs,
+        "skipped": skipped_drugs
     }
 
-def check_interactions_for_drugs(found_drugs):
+def check_interactions_for_drugs(found_drugs, deadline=None):
     """
     Checks for interactions between the found drugs.
     Returns structured interaction data.
     Uses cache to avoid redundant database queries.
     """
+    deadline = ensure_deadline(deadline)
     if len(found_drugs) < 2:
         return []
 
@@ -225,8 +481,9 @@ def check_interactions_for_drugs(found_drugs):
     # deduplicate and lowercase for DB query
     unique_drug_names = list({dn.lower(): dn for dn in drug_names}.keys())
     
-    # Create a cache key from sorted drug names
-    cache_key = "|".join(sorted(unique_drug_names))
+    # Create a cache key from sorted canonical drug names
+    cache_key = "|".join(sorted({canonical_key(dn) for dn in unique_drug_names}))
+    access_stats.record_pair(cache_key)
     
     # Check cache first
     cached_interactions = query_cache.get_interactions(cache_key)
@@ -234,39 +491,70 @@ def check_interactions_for_drugs(found_drugs):
         return cached_interactions
     
     # Query database
-    interactions = get_drug_interactions_from_db(unique_drug_names)
+    # Interactions are safety-critical, so they always get at least a second
+    interactions, reliable = get_drug_interactions_from_db(unique_drug_names, timeout=deadline.timeout(minimum=1.0), with_status=True)
     
-    # Cache the result
-    query_cache.set_interactions(cache_key, interactions)
+    # Cache the result, but never a fallback answer: an empty fallback would mean "no interactions"
+    # long after the outage. The degraded marker also keeps the reply out of the answer cache.
+    if reliable:
+        query_cache.set_interactions(cache_key, interactions)
+    else:
+        deadline.skip("db_fallback")
     
     return interactions
 
-def get_ingredients_from_gemini(drug_name):
+def evaluate_profile_interactions(profile, deadline=None):
+    """
+    Incremental version of check_interactions_for_drugs for a session's medication
+    profile: only pairs involving newly added drugs are queried.
+    """
+    deadline = ensure_deadline(deadline)
+
+    def fetch(new_names, all_names):
+        # Interactions are safety-critical, so they always get at least a second
+        interactions, reliable = get_interactions_involving(new_names, all_names, timeout=deadline.timeout(minimum=1.0), with_status=True)
+        if not reliable:
+            deadline.skip("db_fallback")
+        return interactions, reliable
+
+    return profile.evaluate(fetch)
+
+def get_ingredients_from_gemini(drug_name, deadline=None):
     """
-    Uses Gemini to break down the possible ingredients of a drug using general knowledge.
+    Uses Gemini (structured tier, JSON schema output) to break down the possible ingredients
+    of a drug using general knowledge.
     Returns a list of ingredient names.
+    Known combination brands are answered from the local brand map without calling Gemini.
     Caches results to avoid redundant API calls.
     """
+    access_stats.record_brand(canonical_key(drug_name))
+
     # Check cache first
     cached_ingredients = query_cache.get_ingredients(drug_name)
     if cached_ingredients is not None:
         return cached_ingredients
+
+    known_ingredients = brand_ingredients(drug_name)
+    if known_ingredients:
+        ingredients = [i.title() for i in known_ingredients]
+        query_cache.set_ingredients(drug_name, ingredients)
+        return ingredients
     
     # UPDATED PROMPT: Added synonym handling here too just in case
     prompt = f"""
     List the active ingredients (generic names) found in the drug or brand called '{drug_name}'.
     IMPORTANT: If the ingredient is Paracetamol, write 'Acetaminophen'.
-    Return only a Python list of ingredient names, no explanations.
-    Example: ['Paracetamol', 'Caffeine']
+    Return the generic names in "ingredients", no explanations.
+    Example: {{"ingredients": ["Acetaminophen", "Caffeine"]}}
     """
     try:
-        response = model.generate_content(prompt)
-        # Try to extract a Python list from the response
-        match = re.search(r'\[(.*?)\]', response.text, re.DOTALL)
-        if match:
-            items = match.group(1)
-            # Split by comma and clean up
-            ingredients = [i.strip(" \"'") for i in items.split(',') if i.strip()]
+        response = structured_model.generate_content(
+            prompt,
+            generation_config=INGREDIENTS_CONFIG,
+            request_options=ensure_deadline(deadline).request_options()
+        )
+        ingredients = parse_ingredients(response.text)
+        if ingredients:
             # Cache the result
             query_cache.set_ingredients(drug_name, ingredients)
             return ingredients
@@ -275,84 +563,178 @@ def get_ingredients_from_gemini(drug_name):
         return []
     return []
 
-def build_database_context(user_message, drug_list=None):
+def warm_up_cache(top_n):
+    """
+    Pre-loads the most requested drugs, drug sets and brand breakdowns (from access_stats)
+    so the first requests after a deploy hit the cache. Entries already restored from a
+    snapshot are skipped, so Gemini is only called for brands the snapshot did not cover.
+    """
+    warmed = {"drugs": 0, "pairs": 0, "brands": 0}
+
+    missing_drugs = [d for d in access_stats.top("drugs", top_n) if query_cache.get_drug(d) is None]
+    if missing_drugs:
+        warmed["drugs"] = len(search_drugs_in_database(missing_drugs)["found"])
+
+    for pair_key in access_stats.top("pairs", top_n):
+        if query_cache.get_interactions(pair_key) is not None:
+            continue
+        found = search_drugs_in_database(pair_key.split("|"))["found"]
+        check_interactions_for_drugs(found)
+        warmed["pairs"] += 1
+
+    for brand in access_stats.top("brands", top_n):
+        if query_cache.get_ingredients(brand) is None and get_ingredients_from_gemini(brand):
+            warmed["brands"] += 1
+
+    print(f"Cache warm-up finished: {warmed}")
+    return warmed
+
+def resolve_missing_drugs(missing_drugs, found_drugs, deadline=None):
+    """
+    Step 4 of the agent: resolves drugs missing from the database as brands via their ingredients.
+    We differentiate between "True Missing" (unknown) and "Brand Resolved" (known via Gemini).
+    """
+    deadline = ensure_deadline(deadline)
+    result = {
+        "true_not_found": [],
+        "brand_notes": [],
+        "ingredient_found_drugs": [],
+        "ingredient_interactions": [],
+        "unchecked": [],
+        "resolved": 0,
+    }
+
+    for missing_drug in missing_drugs:
+        # Brand breakdowns are optional enrichment; skip them when time is short
+        if not deadline.allows("brand_breakdown"):
+            result["unchecked"].append(missing_drug)
+            continue
+
+        ingredients = get_ingredients_from_gemini(missing_drug, deadline)
+
+        if ingredients:
+            result["resolved"] += 1
+            # SUCCESS: We found ingredients for this brand/drug
+            # We do NOT add this to 'true_not_found' so Karin won't say "I couldn't find it"
+            
+            brand_str = f"<li><b>{missing_drug}</b> (Brand/Alias) contains: {', '.join(ingredients)}</li>"
+            result["brand_notes"].append(brand_str)
+
+            # Check which ingredients exist in the database
+            db_ingredients = []
+            for ing in ingredients:
+                # Check cache first
+                cached_ing = query_cache.get_drug(ing)
+                if cached_ing is not None:
+                    db_ingredients.append(cached_ing)
+                else:
+                    ing_data, reliable = get_drug_by_name(canonical_key(ing), timeout=deadline.timeout(), with_status=True)
+                    if not reliable:
+                        deadline.skip("db_fallback")
+                    if ing_data:
+                        if reliable:
+                            query_cache.set_drug(ing, ing_data)
+                        db_ingredients.append(ing_data)
+            
+            if db_ingredients:
+                result["ingredient_found_drugs"].extend(db_ingredients)
+                # Check for interactions between these ingredients and other found drugs
+                all_for_interaction = found_drugs + db_ingredients
+                result["ingredient_interactions"].extend(check_interactions_for_drugs(all_for_interaction, deadline))
+        else:
+            # FAIL: We really don't know what this is
+            result["true_not_found"].append(missing_drug)
+
+    return result
+
+def build_database_context(user_message, drug_list=None, deadline=None, profile=None):
     """
     AGENT LOGIC: Analyzes the user message, extracts drugs, queries database,
     and builds comprehensive context for Gemini.
+    Stages that do not fit in the deadline are skipped and listed in metadata["degraded_stages"].
+    With a session `profile` (see medication_profile.py), interactions cover every drug
+    in the profile and only newly added pairs are queried.
     """
-    # Step 1: Extract drugs from message
-    extracted = extract_drugs_from_message(user_message)
-    drugs_to_search = extracted.get('drugs_mentioned', [])
+    deadline = ensure_deadline(deadline)
+    client_drugs = [d for d in drug_list if isinstance(d, str) and d.strip()] if isinstance(drug_list, list) else []
+
+    # Steps 1-5 run as a stage graph: the client-provided drug_list needs no extraction,
+    # so its DB lookup and interaction prefetch overlap with the Gemini extraction call.
+    def extract():
+        # Step 1: Extract drugs from message (skipped if there is no time; drug_list still gets checked)
+        if deadline.allows("extraction"):
+            return extract_drugs_from_message(user_message, deadline)
+        return {"drugs_mentioned": [], "intent": "general_question", "query_context": ""}
+
+    def client_lookup():
+        return search_drugs_in_database(client_drugs, deadline)
+
+    def client_interactions(client_lookup):
+        # Prefetch: fills the interactions cache for the drug_list while extraction is in flight
+        found = client_lookup['found']
+        if profile is not None:
+            # A drug_list sent by the client is the authoritative medication list
+            if isinstance(drug_list, list):
+                profile.sync([d.get('name') for d in found if d.get('name')])
+            return evaluate_profile_interactions(profile, deadline)
+        return check_interactions_for_drugs(found, deadline) if len(found) > 1 else []
+
+    def extracted_lookup(extract, client_lookup):
+        # Step 2/3: Search only the names extraction added on top of drug_list
+        client_keys = {canonical_key(d) for d in client_drugs}
+        extra = [d for d in extract.get('drugs_mentioned', []) if isinstance(d, str) and d.strip() and canonical_key(d) not in client_keys]
+        return search_drugs_in_database(extra, deadline)
+
+    def brands(extracted_lookup, client_lookup):
+        # Step 4: Brand/missing drugs
+        found = client_lookup['found'] + extracted_lookup['found']
+        return resolve_missing_drugs(client_lookup['not_found'] + extracted_lookup['not_found'], found, deadline)
+
+    def interactions(extracted_lookup, client_lookup, client_interactions):
+        # Step 5: Check for interactions among found drugs (reuses the prefetch if extraction added nothing)
+        if not extracted_lookup['found']:
+            return client_interactions
+        if profile is not None:
+            profile.add([d.get('name') for d in extracted_lookup['found'] if d.get('name')])
+            return evaluate_profile_interactions(profile, deadline)
+        found = client_lookup['found'] + extracted_lookup['found']
+        return check_interactions_for_drugs(found, deadline)
+
+    graph = StageGraph()
+    graph.add("extract", extract)
+    graph.add("client_lookup", client_lookup)
+    graph.add("client_interactions", client_interactions, deps=["client_lookup"])
+    graph.add("extracted_lookup", extracted_lookup, deps=["extract", "client_lookup"])
+    graph.add("brands", brands, deps=["extracted_lookup", "client_lookup"])
+    graph.add("interactions", interactions, deps=["extracted_lookup", "client_lookup", "client_interactions"])
+    stages = graph.run()
+
+    extracted = stages["extract"]
     intent = extracted.get('intent', 'general_question')
     query_context = extracted.get('query_context', '')
-    
-    # Step 2: Combine with provided drug_list
-    if drug_list and isinstance(drug_list, list):
-        drugs_to_search = list(set(drugs_to_search + drug_list))
-    
-    # Remove duplicates and empty strings
-    drugs_to_search = [d.strip() for d in drugs_to_search if d.strip()]
-    
-    if not drugs_to_search:
-        return "", {"found_drugs": [], "not_found_drugs": [], "ingredient_found_drugs": [], "ingredient_interactions": [], "interactions_found_db": 0, "interactions_found_llm": 0, "database_verifications": 0}
-    
-    # Step 3: Search database for all drugs
-    search_results = search_drugs_in_database(drugs_to_search)
-    found_drugs = search_results['found']
-    initial_not_found = search_results['not_found']
+
+    found_drugs = stages["client_lookup"]['found'] + stages["extracted_lookup"]['found']
+    initial_not_found = stages["client_lookup"]['not_found'] + stages["extracted_lookup"]['not_found']
+    unchecked_drugs = stages["client_lookup"]['skipped'] + stages["extracted_lookup"]['skipped']
+
+    if not (found_drugs or initial_not_found or unchecked_drugs):
+        return "", {"found_drugs": [], "not_found_drugs": [], "ingredient_found_drugs": [], "ingredient_interactions": [], "interactions_found_db": 0, "interactions_found_llm": 0, "database_verifications": 0, "degraded_stages": deadline.degraded_stages}
 
     database_verifications = len(found_drugs)
     db_attempted = 1
     db_successful = 1 if len(found_drugs) > 0 else 0
 
-    # Step 4: Logic for Brand/Missing Drugs
-    # We differentiate between "True Missing" (unknown) and "Brand Resolved" (known via Gemini)
-    true_not_found_drugs = []
-    brand_resolved_notes = []
-
-    ingredient_found_drugs = []
-    ingredient_interactions = []
-    interactions_found_llm = 0
+    brand_results = stages["brands"]
+    true_not_found_drugs = brand_results["true_not_found"]
+    brand_resolved_notes = brand_results["brand_notes"]
+    ingredient_found_drugs = brand_results["ingredient_found_drugs"]
+    ingredient_interactions = brand_results["ingredient_interactions"]
+    unchecked_drugs += brand_results["unchecked"]
+    interactions_found_llm = brand_results["resolved"]
     llm_attempted = len(initial_not_found)
-    llm_successful = 0
-
-    if initial_not_found:
-        for missing_drug in initial_not_found:
-            ingredients = get_ingredients_from_gemini(missing_drug)
-
-            if ingredients:
-                interactions_found_llm += 1
-                llm_successful += 1
-                # SUCCESS: We found ingredients for this brand/drug
-                # We do NOT add this to 'true_not_found_drugs' so Karin won't say "I couldn't find it"
-                
-                brand_str = f"<li><b>{missing_drug}</b> (Brand/Alias) contains: {', '.join(ingredients)}</li>"
-                brand_resolved_notes.append(brand_str)
-
-                # Check which ingredients exist in the database
-                db_ingredients = []
-                for ing in ingredients:
-                    # Check cache first
-                    cached_ing = query_cache.get_drug(ing)
-                    if cached_ing is not None:
-                        db_ingredients.append(cached_ing)
-                    else:
-                        ing_data = get_drug_by_name(ing)
-                        if ing_data:
-                            query_cache.set_drug(ing, ing_data)
-                            db_ingredients.append(ing_data)
-                
-                if db_ingredients:
-                    ingredient_found_drugs.extend(db_ingredients)
-                    # Check for interactions between these ingredients and other found drugs
-                    all_for_interaction = found_drugs + db_ingredients
-                    ingredient_interactions.extend(check_interactions_for_drugs(all_for_interaction))
-            else:
-                # FAIL: We really don't know what this is
-                true_not_found_drugs.append(missing_drug)
+    llm_successful = brand_results["resolved"]
 
-    # Step 5: Check for interactions among found drugs
-    interactions = check_interactions_for_drugs(found_drugs) if found_drugs else []
+    interactions = stages["interactions"]
     interactions_found_db = len(found_drugs)
 
     # Step 6: Build context injection for Gemini
@@ -372,44 +754,50 @@ def build_database_context(user_message, drug_list=None):
     if brand_resolved_notes:
         context_parts.append(f"[DATABASE] Brand Name Analysis (VERIFIED):\nThe following brands have been analyzed and their ingredients identified. Treat this as factual data.\n<ul>{''.join(brand_resolved_notes)}</ul>")
 
-    # Add interactions if found
-    if interactions:
-        interactions_html = ""
-        for interaction in interactions:
-            drug_a = interaction.get('drug_a', '')
-            drug_b = interaction.get('drug_b', '')
-            desc = interaction.get('description', '')
-            interactions_html += f"<li><b>{drug_a}</b> + <b>{drug_b}</b>: {desc}</li>"
-        context_parts.append(f"[DATABASE] Direct Drug Interactions Found:\n<ul>{interactions_html}</ul>")
-
-    # Add ingredient-based interactions if found
-    if ingredient_interactions:
-        interactions_html = ""
-        for interaction in ingredient_interactions:
-            drug_a = interaction.get('drug_a', '')
-            drug_b = interaction.get('drug_b', '')
-            desc = interaction.get('description', '')
-            interactions_html += f"<li><b>{drug_a}</b> + <b>{drug_b}</b>: {desc}</li>"
-        context_parts.append(f"[DATABASE] Interactions based on Brand Ingredients:\n<ul>{interactions_html}</ul>")
+    # Interactions go here (after drugs/brands, before missing drugs); they are filled in last
+    interactions_slot = len(context_parts)
 
     # Add missing drugs (True missing only)
     if true_not_found_drugs:
         missing_text = ", ".join([f"<b>{drug}</b>" for drug in true_not_found_drugs])
         context_parts.append(f"[DATABASE] Drugs NOT found in database: {missing_text}\nPlease inform the user you cannot find these specific names.")
 
+    # Add drugs we ran out of time to check (not the same as missing)
+    if unchecked_drugs:
+        unchecked_text = ", ".join([f"<b>{drug}</b>" for drug in unchecked_drugs])
+        context_parts.append(f"[DATABASE] Could not finish checking in time: {unchecked_text}\nTell the user you could not check these just now and ask them to try again; do NOT say they are missing from the database.")
+
     # Add intent context
     if intent != "general_question":
         context_parts.append(f"[USER INTENT] The user is asking about: {intent.replace('_', ' ')}")
 
+    # Add interactions, ranked and capped to whatever token budget the other parts left over.
+    # Interactions that do not fit are returned in metadata instead of the prompt.
+    fixed_tokens = sum(estimate_tokens(part) for part in context_parts)
+    interaction_parts, omitted_interactions = assemble_interaction_sections(
+        [
+            ("[DATABASE] Direct Drug Interactions Found:", interactions),
+            ("[DATABASE] Interactions based on Brand Ingredients:", ingredient_interactions),
+        ],
+        mentioned_drugs=extracted.get('drugs_mentioned', []),
+        token_budget=DEFAULT_TOKEN_BUDGET - fixed_tokens
+    )
+    context_parts[interactions_slot:interactions_slot] = interaction_parts
+
     if context_parts:
         final_context = "\n\n" + "\n".join(context_parts)
         final_context += "\n\n[INSTRUCTION] Use the database information above. Always mention drug IDs when discussing medications. Provide accurate, evidence-based answers based on database data."
         # Return both the context string and metadata so caller can mark the response source
         metadata = {
+            "intent": intent,
             "found_drugs": [d.get('name') for d in found_drugs],
             "not_found_drugs": true_not_found_drugs,
             "ingredient_found_drugs": [d.get('name') for d in ingredient_found_drugs],
             "ingredient_interactions": ingredient_interactions,
+            "omitted_interactions": omitted_interactions,
+            "unchecked_drugs": unchecked_drugs,
+            "degraded_stages": deadline.degraded_stages,
+            "stage_timings_ms": graph.timings,
             "interactions_found_db": interactions_found_db,
             "interactions_found_llm": interactions_found_llm,
             "database_verifications": database_verifications,
@@ -421,16 +809,44 @@ def build_database_context(user_message, drug_list=None):
         return final_context, metadata
 
     # No context parts -> return empty string and empty metadata
-    return "", {"found_drugs": [], "not_found_drugs": [], "ingredient_found_drugs": [], "ingredient_interactions": [], "interactions_found_db": 0, "interactions_found_llm": 0, "database_verifications": 0}
+    return "", {"found_drugs": [], "not_found_drugs": [], "ingredient_found_drugs": [], "ingredient_interactions": [], "interactions_found_db": 0, "interactions_found_llm": 0, "database_verifications": 0, "degraded_stages": deadline.degraded_stages}
+
+# Replies sent when Gemini fails. They are not real answers, so /chat keeps them out of the conversation log
+QUOTA_ERROR_REPLY = "[concerned] <b>I'm temporarily unavailable due to high demand.</b> My service has reached its usage limit. Please wait a few moments and try again. Your safety is my priority, and I want to make sure I can give you accurate information from my complete database."
+CONNECTION_ERROR_REPLY = "[concerned] I'm having trouble connecting to my knowledge base right now. Please try again in a moment. If the problem persists, there might be a temporary service issue."
+ERROR_REPLIES = {QUOTA_ERROR_REPLY, CONNECTION_ERROR_REPLY}
+
+
+def is_error_reply(message):
+    return message in ERROR_REPLIES
 
 # --- MAIN LOGIC FUNCTION ---
-def get_karin_response(user_message, chat_history, language='en', drug_list=None):
+def get_karin_response(user_message, chat_history, language='en', drug_list=None, deadline=None, user_name=None, first_turn=False, profile=None, extras=None):
+    """
+    Builds the database context and asks Gemini for Karin's reply. For first turns
+    (the user's first question) the reply may come from the answer cache, skipping generation.
+    If `extras` is a dict it receives "omitted_interactions": the interactions that did not
+    fit the prompt budget, so the caller can show them alongside the reply.
+    """
     start_time = time.time()
+    deadline = ensure_deadline(deadline)
     if not user_message:
         return "Please tell me which medications you are taking.", "curious"
     
     # Use the agent to build comprehensive database context (also returns metadata)
-    context_injection, metadata = build_database_context(user_message, drug_list)
+    context_injection, metadata = build_database_context(user_message, drug_list, deadline, profile)
+    if extras is not None:
+        extras["omitted_interactions"] = metadata.get("omitted_interactions", [])
+    if metadata.get("degraded_stages"):
+        print(f"Request degraded, stages skipped or answered from fallback data: {', '.join(metadata['degraded_stages'])}")
+
+    # Identical first-turn questions about the same drugs reuse an earlier reply
+    answer_key = answer_cache_key(metadata, language, user_message) if first_turn else None
+    if answer_key:
+        cached_answer = answer_cache.get(answer_key, user_name)
+        if cached_answer:
+            update_metrics(time.time() - start_time, metadata.get("db_attempted", 0), metadata.get("db_successful", 0), metadata.get("llm_attempted", 0), metadata.get("llm_successful", 0), metadata.get("interactions_found_db", 0), metadata.get("interactions_found_llm", 0))
+            return cached_answer
 
     final_message = user_message + context_injection
 
@@ -438,7 +854,8 @@ def get_karin_response(user_message, chat_history, language='en', drug_list=None
     chat = model.start_chat(history=chat_history)
 
     try:
-        response = chat.send_message(final_message)
+        # The reply is never skipped: it gets the remaining budget, but at least MIN_REPLY_SECONDS
+        response = chat.send_message(final_message, request_options=deadline.request_options(minimum=MIN_REPLY_SECONDS))
         bot_text = response.text
         response_time = time.time() - start_time
 
@@ -485,6 +902,8 @@ def get_karin_response(user_message, chat_history, language='en', drug_list=None
 
         # Attach source note to the message (preserve HTML requirement)
         final_output = message + source_note
+        if answer_key:
+            answer_cache.set(answer_key, final_output, emotion, user_name)
         return final_output, emotion
 
     except Exception as e:
@@ -493,6 +912,6 @@ def get_karin_response(user_message, chat_history, language='en', drug_list=None
         
         # Check for quota/rate limit errors
         if "429" in error_str or "quota" in error_str.lower() or "rate" in error_str.lower():
-            return "[concerned] <b>I'm temporarily unavailable due to high demand.</b> My service has reached its usage limit. Please wait a few moments and try again. Your safety is my priority, and I want to make sure I can give you accurate information from my complete database.", "concerned"
+            return QUOTA_ERROR_REPLY, "concerned"
         
-        return "[concerned] I'm having trouble connecting to my knowledge base right now. Please try again in a moment. If the problem persists, there might be a temporary service issue.", "concerned"
+        return CONNECTION_ERROR_REPLY, "concerned"
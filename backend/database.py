@@ -1,6 +1,7 @@
 import os
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, Query
 from dotenv import load_dotenv
+from circuit_breaker import CircuitBreaker
 
 load_dotenv()
 
@@ -9,33 +10,53 @@ uri = os.getenv("NEO4J_URI")
 user = os.getenv("NEO4J_USERNAME")
 password = os.getenv("NEO4J_PASSWORD")
 
-# Initialize driver only if credentials exist to prevent crash on start
-driver = None
-if uri and user and password:
+# Circuit breaker around the graph: after repeated failures, calls go straight to the
+# fallback data instead of waiting for a driver timeout, and a probe call restores service
+neo4j_breaker = CircuitBreaker(
+    "neo4j",
+    failure_threshold=int(os.getenv("NEO4J_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.getenv("NEO4J_BREAKER_RESET_SECONDS", "30"))
+)
+connection_timeout = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "5"))
+
+def _connect_driver(verbose=True):
+    """Creates and verifies a Neo4j driver. Returns None (and opens the breaker) on failure."""
     try:
         # Use the corrected Neo4j Aura connection string
         connection_uri = uri
         
-        print(f"🔗 Attempting to connect to Neo4j Aura...")
-        print(f"   URI: {connection_uri}")
-        print(f"   Instance: {os.getenv('AURA_INSTANCEID', 'Unknown')}")
+        if verbose:
+            print(f"🔗 Attempting to connect to Neo4j Aura...")
+            print(f"   URI: {connection_uri}")
+            print(f"   Instance: {os.getenv('AURA_INSTANCEID', 'Unknown')}")
         
-        driver = GraphDatabase.driver(connection_uri, auth=(user, password))
+        new_driver = GraphDatabase.driver(
+            connection_uri, auth=(user, password),
+            connection_timeout=connection_timeout,
+            connection_acquisition_timeout=connection_timeout
+        )
         
         # Test the connection with a simpler query
-        with driver.session() as session:
+        with new_driver.session() as session:
             result = session.run("RETURN 1 AS test")
             if result.single()["test"] == 1:
                 print("✅ Successfully connected to Neo4j Database!")
                 print("🎉 Database is online and ready!")
+                return new_driver
             else:
                 print("❌ Database connection test failed!")
-                driver = None
+                new_driver.close()
+                neo4j_breaker.force_open("Connection test failed")
+                return None
                 
     except Exception as e:
         error_str = str(e)
         print(f"❌ Failed to connect to Neo4j: {error_str}")
+        neo4j_breaker.force_open(e)
         
+        if not verbose:
+            return None
+
         if "Unable to retrieve routing information" in error_str:
             print("\n" + "!"*60)
             print("🛑 CONNECTION ERROR: UNABLE TO CONNECT")
@@ -54,22 +75,74 @@ if uri and user and password:
             print(f"   • Check your Neo4j Aura dashboard")
             print(f"   • Verify credentials are correct")
         
-        driver = None
+        return None
+
+# Initialize driver only if credentials exist to prevent crash on start
+driver = None
+if uri and user and password:
+    driver = _connect_driver()
 else:
     print("❌ Missing Neo4j credentials in environment variables!")
     print(f"URI: {'✓' if uri else '✗'}")
     print(f"Username: {'✓' if user else '✗'}")
     print(f"Password: {'✓' if password else '✗'}")
 
-def get_drug_interactions_from_db(drug_names):
+def _acquire_driver():
+    """
+    Returns the driver if the circuit allows a call, otherwise None (use fallback data).
+    While half-open this is the probe: it reconnects if the startup connection never came up.
+    Every non-None return must be followed by neo4j_breaker.record_success()/record_failure()/record_ignored().
+    """
+    global driver
+    if not (uri and user and password):
+        return None
+    if not neo4j_breaker.allow_request():
+        return None
+    if driver is None:
+        driver = _connect_driver(verbose=False)
+        if driver is None:
+            # _connect_driver already re-opened the breaker
+            return None
+    return driver
+
+# Query timeouts shorter than this come from a nearly spent request deadline, not from
+# a slow graph, so timing out under them says nothing about Neo4j's health
+BREAKER_MIN_TIMEOUT = float(os.getenv("NEO4J_BREAKER_MIN_TIMEOUT", "2"))
+
+def _is_timeout(error):
+    code = getattr(error, "code", None) or ""
+    return isinstance(error, TimeoutError) or "TimedOut" in code or "timed out" in str(error).lower()
+
+def _record_query_failure(error, timeout):
+    """Counts a failed query against the breaker unless it was the caller's own short deadline."""
+    if timeout is not None and timeout < BREAKER_MIN_TIMEOUT and _is_timeout(error):
+        neo4j_breaker.record_ignored()
+    else:
+        neo4j_breaker.record_failure(error)
+
+def _graph_configured():
+    return bool(uri and user and password)
+
+def _with_status(result, reliable, with_status):
+    """
+    Query functions take `with_status=True` to also learn whether *this call* answered
+    from the graph. `reliable` is False when the graph is configured but the call fell back
+    to mock data (breaker open or query failed), so callers must not cache the result.
+    """
+    return (result, reliable) if with_status else result
+
+def get_drug_interactions_from_db(drug_names, timeout=None, with_status=False):
     """
     Queries the existing Neo4j database for interactions between the provided drugs.
+    `timeout` (seconds) bounds the query, e.g. the request's remaining budget.
     Returns empty list if database connection fails.
     """
     interactions_found = []
+    reliable = not _graph_configured()
     
     # Try database first
-    if driver:
+    active_driver = _acquire_driver()
+    if active_driver:
         try:
             # Query to find interactions (Bidirectional)
             # Assumes Nodes have label :Drug and property 'name'
@@ -83,8 +156,8 @@ def get_drug_interactions_from_db(drug_names):
             # Convert input list to lowercase for case-insensitive matching
             drugs_lower = [d.lower() for d in drug_names]
 
-            with driver.session() as session:
-                result = session.run(query, drugs=drugs_lower)
+            with active_driver.session() as session:
+                result = session.run(Query(query, timeout=timeout), drugs=drugs_lower)
                 
                 # Use a set to avoid duplicates (A-B and B-A)
                 seen_pairs = set()
@@ -101,8 +174,11 @@ def get_drug_interactions_from_db(drug_names):
                             "description": record["Description"]
                         })
                         seen_pairs.add(pair)
+            neo4j_breaker.record_success()
+            reliable = True
                         
         except Exception as e:
+            _record_query_failure(e, timeout)
             print(f"Database interaction query failed, using fallback data: {e}")
     
     # Fallback to mock data if no database interactions found
@@ -116,9 +192,9 @@ def get_drug_interactions_from_db(drug_names):
                (drug_b_lower in drugs_lower and drug_a_lower in drugs_lower):
                 interactions_found.append(interaction)
     
-    return interactions_found
+    return _with_status(interactions_found, reliable, with_status)
 
-def get_drug_by_name(drug_name):
+def get_drug_by_name(drug_name, timeout=None, with_status=False):
     """
     Retrieves information about a single drug by name.
     Returns a dictionary with drug details or None if not found.
@@ -126,10 +202,12 @@ def get_drug_by_name(drug_name):
     """
     # Handle None or empty input
     if not drug_name or not isinstance(drug_name, str):
-        return None
+        return _with_status(None, True, with_status)
+    reliable = not _graph_configured()
     
     # Try database first
-    if driver:
+    active_driver = _acquire_driver()
+    if active_driver:
         try:
             query = """
             MATCH (d:Drug)
@@ -137,25 +215,28 @@ def get_drug_by_name(drug_name):
             RETURN d.ID AS id, d.name AS name
             """
 
-            with driver.session() as session:
-                result = session.run(query, name=drug_name)
+            with active_driver.session() as session:
+                result = session.run(Query(query, timeout=timeout), name=drug_name)
                 record = result.single()
+            neo4j_breaker.record_success()
+            reliable = True
                 
-                if record:
-                    return {
-                        "id": record.get("id"),
-                        "name": record.get("name")
-                    }
+            if record:
+                return _with_status({
+                    "id": record.get("id"),
+                    "name": record.get("name")
+                }, True, with_status)
         except Exception as e:
+            _record_query_failure(e, timeout)
             print(f"Database query failed, using fallback data: {e}")
     
     # Fallback to mock data
     drug_name_lower = drug_name.lower()
     for mock_name, mock_data in MOCK_DRUGS.items():
         if drug_name_lower in mock_name.lower() or mock_name.lower() in drug_name_lower:
-            return mock_data.copy()
+            return _with_status(mock_data.copy(), reliable, with_status)
     
-    return None
+    return _with_status(None, reliable, with_status)
 
 def get_drug_ingredients(drug_name):
     """
@@ -185,7 +266,7 @@ def get_brand_drugs(drug_name):
     print(f"No brand/ingredient data available for {drug_name} in current database structure")
     return []
 
-def search_drugs_by_keyword(keyword):
+def search_drugs_by_keyword(keyword, timeout=None, with_status=False):
     """
     Searches for drugs by keyword (fuzzy matching).
     Useful when exact drug name doesn't match but similar drugs exist.
@@ -193,12 +274,14 @@ def search_drugs_by_keyword(keyword):
     """
     # Handle None or empty input
     if not keyword or not isinstance(keyword, str):
-        return []
+        return _with_status([], True, with_status)
     
     results = []
+    reliable = not _graph_configured()
     
     # Try database first
-    if driver:
+    active_driver = _acquire_driver()
+    if active_driver:
         try:
             query = """
             MATCH (d:Drug)
@@ -207,16 +290,19 @@ def search_drugs_by_keyword(keyword):
             LIMIT 10
             """
 
-            with driver.session() as session:
-                result = session.run(query, keyword=keyword)
+            with active_driver.session() as session:
+                result = session.run(Query(query, timeout=timeout), keyword=keyword)
                 
                 for record in result:
                     results.append({
                         "id": record.get("id"),
                         "name": record.get("name")
                     })
+            neo4j_breaker.record_success()
+            reliable = True
                     
         except Exception as e:
+            _record_query_failure(e, timeout)
             print(f"Database search failed, using fallback data: {e}")
     
     # Fallback to mock data
@@ -228,7 +314,94 @@ def search_drugs_by_keyword(keyword):
                 if len(results) >= 5:  # Limit results
                     break
     
-    return results
+    return _with_status(results, reliable, with_status)
+
+def get_interactions_involving(new_drug_names, all_drug_names, timeout=None, with_status=False):
+    """
+    Interactions between each of `new_drug_names` and any drug in `all_drug_names`
+    (which includes the new ones). Used to evaluate only the new pairs when a drug
+    is added to a medication profile. Falls back to mock data like get_drug_interactions_from_db.
+    """
+    new_lower = {d.lower() for d in new_drug_names}
+    all_lower = {d.lower() for d in all_drug_names}
+    interactions_found = []
+
+    active_driver = _acquire_driver()
+    if active_driver:
+        try:
+            query = """
+            MATCH (a:Drug)-[r:INTERACTS_WITH]-(b:Drug)
+            WHERE toLower(a.name) IN $new_drugs AND toLower(b.name) IN $drugs
+            RETURN a.name AS Drug1, b.name AS Drug2, r.description AS Description
+            """
+            with active_driver.session() as session:
+                result = session.run(Query(query, timeout=timeout), new_drugs=list(new_lower), drugs=list(all_lower))
+                seen_pairs = set()
+                for record in result:
+                    d1, d2 = record["Drug1"], record["Drug2"]
+                    pair = tuple(sorted((d1.lower(), d2.lower())))
+                    if pair not in seen_pairs:
+                        interactions_found.append({
+                            "drug_a": d1,
+                            "drug_b": d2,
+                            "description": record["Description"]
+                        })
+                        seen_pairs.add(pair)
+            neo4j_breaker.record_success()
+            return _with_status(interactions_found, True, with_status)
+        except Exception as e:
+            _record_query_failure(e, timeout)
+            print(f"Database interaction query failed, using fallback data: {e}")
+
+    for interaction in MOCK_INTERACTIONS:
+        a, b = interaction["drug_a"].lower(), interaction["drug_b"].lower()
+        if (a in new_lower and b in all_lower) or (b in new_lower and a in all_lower):
+            interactions_found.append(interaction)
+    return _with_status(interactions_found, not _graph_configured(), with_status)
+
+def get_all_drug_names(timeout=None, with_status=False):
+    """
+    Returns every Drug name in the graph (used to build the autocomplete index).
+    Falls back to the mock drug names if the database is unavailable.
+    """
+    active_driver = _acquire_driver()
+    if active_driver:
+        try:
+            query = """
+            MATCH (d:Drug)
+            RETURN d.name AS name
+            """
+            with active_driver.session() as session:
+                names = [record["name"] for record in session.run(Query(query, timeout=timeout)) if record["name"]]
+            neo4j_breaker.record_success()
+            return _with_status(names, True, with_status)
+        except Exception as e:
+            _record_query_failure(e, timeout)
+            print(f"Drug name listing failed, using fallback data: {e}")
+
+    return _with_status([mock_data["name"] for mock_data in MOCK_DRUGS.values()], not _graph_configured(), with_status)
+
+def get_graph_version(timeout=None):
+    """
+    Returns the version stamp written by import_data.py, or None if there is no stamp
+    (or the graph is unreachable).
+    """
+    active_driver = _acquire_driver()
+    if not active_driver:
+        return None
+    try:
+        query = """
+        MATCH (v:GraphVersion {id: 'current'})
+        RETURN v.version AS version
+        """
+        with active_driver.session() as session:
+            record = session.run(Query(query, timeout=timeout)).single()
+        neo4j_breaker.record_success()
+        return record.get("version") if record else None
+    except Exception as e:
+        _record_query_failure(e, timeout)
+        print(f"Graph version check failed: {e}")
+        return None
 
 def close_driver():
     if driver:
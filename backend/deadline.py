@@ -0,0 +1,68 @@
+import os
+import time
+
+# --- REQUEST DEADLINES ---
+# A Deadline is created per /chat request and passed down through the pipeline.
+# Each stage asks how much time is left: required stages get the remaining
+# budget as their timeout, optional enrichment (fuzzy search, brand breakdowns)
+# is skipped when the budget is short, and skipped stages are recorded so the
+# response metadata shows what was degraded. Lookups answered from fallback data
+# after a failed graph call are recorded the same way ("db_fallback").
+
+DEFAULT_REQUEST_BUDGET = float(os.getenv("REQUEST_BUDGET_SECONDS", "25"))
+
+# Minimum remaining budget (seconds) a stage needs before it is started
+STAGE_MIN_SECONDS = {
+    "extraction": float(os.getenv("STAGE_MIN_EXTRACTION", "8")),
+    "db_lookup": 0.5,
+    "fuzzy_search": float(os.getenv("STAGE_MIN_FUZZY", "6")),
+    "brand_breakdown": float(os.getenv("STAGE_MIN_BRANDS", "10")),
+}
+
+# The final reply always gets at least this long, even if earlier stages ate the budget
+MIN_REPLY_SECONDS = float(os.getenv("MIN_REPLY_SECONDS", "5"))
+
+
+class Deadline:
+    """Absolute per-request deadline. Deadline(None) never expires."""
+
+    def __init__(self, seconds=DEFAULT_REQUEST_BUDGET):
+        self.budget = seconds
+        self.started_at = time.monotonic()
+        self.expires_at = None if seconds is None else self.started_at + seconds
+        self.degraded_stages = []
+
+    def remaining(self):
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, stage):
+        """True if there is enough budget left to start `stage`; otherwise records it as degraded."""
+        if self.remaining() >= STAGE_MIN_SECONDS.get(stage, 0):
+            return True
+        self.skip(stage)
+        return False
+
+    def skip(self, stage):
+        if stage not in self.degraded_stages:
+            self.degraded_stages.append(stage)
+
+    def timeout(self, minimum=0.1):
+        """Remaining budget as a timeout value (None when unbounded)."""
+        if self.expires_at is None:
+            return None
+        return max(minimum, self.remaining())
+
+    def request_options(self, minimum=0.1):
+        """Gemini request_options carrying the remaining budget as the call timeout."""
+        timeout = self.timeout(minimum)
+        return {} if timeout is None else {"timeout": timeout}
+
+
+def ensure_deadline(deadline):
+    """Lets every pipeline function accept deadline=None (no time limit)."""
+    return deadline if deadline is not None else Deadline(None)
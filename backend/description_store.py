@@ -0,0 +1,154 @@
+import re
+import threading
+
+# --- INTERNED INTERACTION DESCRIPTIONS ---
+# DrugBank-style interaction descriptions are highly templated
+# ("Warfarin may increase the anticoagulant activities of Aspirin."), and the
+# same edge used to be copied into every cached drug set that contains the pair.
+# The store keeps each distinct template and drug name once and gives every
+# edge a small integer id:
+#
+#   template  "\x00 may increase the anticoagulant activities of \x00."
+#   slots     (name id of "Warfarin", name id of "Aspirin")
+#   edge      (drug_a name id, drug_b name id, template id, slots)
+#
+# Cache entries hold tuples of edge ids; full dicts/text are rendered only when
+# a request reads them to build its context. Ids are only meaningful inside this
+# process, so shared cache backends keep storing plain dicts.
+#
+# reset() (called when the graph version changes) starts a new generation so the
+# tables don't grow forever; ids interned before it no longer render.
+
+SLOT = "\x00"
+
+
+class EdgeRefs(tuple):
+    """Edge ids from intern_many(), tagged with the store generation they belong to."""
+
+    def __new__(cls, refs, generation):
+        instance = super().__new__(cls, refs)
+        instance.generation = generation
+        return instance
+
+
+class DescriptionStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._reset_tables()
+
+    def _reset_tables(self):
+        self.names = []
+        self._name_ids = {}
+        self.templates = []
+        self._template_ids = {}
+        self.edges = []
+        self._edge_ids = {}
+
+    def _intern_name(self, name):
+        # Caller holds the lock
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def _intern_template(self, template):
+        # Caller holds the lock
+        template_id = self._template_ids.get(template)
+        if template_id is None:
+            template_id = self._template_ids[template] = len(self.templates)
+            self.templates.append(template)
+        return template_id
+
+    @staticmethod
+    def _templatize(description, drug_names):
+        """Replaces mentions of the edge's drugs (any case) with slots; returns (template, slot texts)."""
+        names = sorted({n for n in drug_names if n}, key=len, reverse=True)
+        if not names or SLOT in description:
+            return description, ()
+        pattern = re.compile("|".join(re.escape(n) for n in names), re.IGNORECASE)
+        slots = []
+
+        def to_slot(match):
+            slots.append(match.group(0))
+            return SLOT
+
+        return pattern.sub(to_slot, description), tuple(slots)
+
+    @staticmethod
+    def _parse(interaction):
+        """(drug_a, drug_b, template, slot texts), or None if the dict does not have the plain shape."""
+        if not isinstance(interaction, dict) or set(interaction) != {"drug_a", "drug_b", "description"} \
+                or not all(isinstance(v, str) for v in interaction.values()):
+            return None
+        drug_a, drug_b = interaction["drug_a"], interaction["drug_b"]
+        template, slot_texts = DescriptionStore._templatize(interaction["description"], (drug_a, drug_b))
+        return drug_a, drug_b, template, slot_texts
+
+    def _intern_edge(self, drug_a, drug_b, template, slot_texts):
+        # Caller holds the lock
+        key = (self._intern_name(drug_a), self._intern_name(drug_b), self._intern_template(template),
+               tuple(self._intern_name(text) for text in slot_texts))
+        edge_id = self._edge_ids.get(key)
+        if edge_id is None:
+            edge_id = self._edge_ids[key] = len(self.edges)
+            self.edges.append(key)
+        return edge_id
+
+    def intern(self, interaction):
+        """
+        Returns the edge id for an interaction dict, or the dict itself if it does not
+        have the plain {"drug_a", "drug_b", "description"} shape.
+        """
+        parsed = self._parse(interaction)
+        if parsed is None:
+            return interaction
+        with self._lock:
+            return self._intern_edge(*parsed)
+
+    def intern_many(self, interactions):
+        parsed = [(interaction, self._parse(interaction)) for interaction in interactions]
+        with self._lock:
+            refs = [interaction if edge is None else self._intern_edge(*edge) for interaction, edge in parsed]
+            return EdgeRefs(refs, self.generation)
+
+    def is_current(self, refs):
+        """False for refs interned before the last reset()."""
+        return getattr(refs, "generation", self.generation) == self.generation
+
+    def reset(self):
+        """Drops every interned name, template and edge and starts a new generation."""
+        with self._lock:
+            # Bump first: a reader that picks up the new tables then sees a stale generation
+            self.generation += 1
+            self._reset_tables()
+
+    @staticmethod
+    def _render(ref, names, templates, edges):
+        if not isinstance(ref, int):
+            return ref
+        drug_a, drug_b, template_id, slots = edges[ref]
+        parts = templates[template_id].split(SLOT)
+        text = [parts[0]]
+        for slot, part in zip(slots, parts[1:]):
+            text.append(names[slot])
+            text.append(part)
+        return {"drug_a": names[drug_a], "drug_b": names[drug_b], "description": "".join(text)}
+
+    def render(self, ref):
+        """Rebuilds the interaction dict for an edge id (dicts pass through unchanged)."""
+        return self._render(ref, self.names, self.templates, self.edges)
+
+    def render_many(self, refs):
+        """Renders refs from intern_many(); None if they are from before the last reset()."""
+        names, templates, edges = self.names, self.templates, self.edges  # Read before the generation check
+        if not self.is_current(refs):
+            return None
+        return [self._render(ref, names, templates, edges) for ref in refs]
+
+    def get_stats(self):
+        return {"edges": len(self.edges), "templates": len(self.templates), "names": len(self.names)}
+
+
+description_store = DescriptionStore()
@@ -0,0 +1,136 @@
+import os
+import re
+import json
+from functools import lru_cache
+
+# --- DRUG NAME CANONICALIZATION ---
+# Deterministic normalization applied before every cache key and DB query so
+# "Acetaminophen", "paracetamol " and "Tylenol" share one cache entry and one lookup.
+#
+# The synonym/brand map is a JSON file:
+#   {"synonyms": {"alias": "canonical"}, "brands": {"brand": ["ingredient", ...]}}
+# Single-ingredient brands belong in "synonyms"; combination products go in "brands".
+
+DEFAULT_SYNONYMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "drug_synonyms.json")
+
+# Salt / hydrate words that can trail a drug name ("Naproxen Sodium", "Sertraline HCl")
+SALT_WORDS = {
+    "hydrochloride", "hcl", "hydrobromide", "hbr", "sodium", "potassium", "calcium",
+    "magnesium", "maleate", "mesylate", "besylate", "succinate", "tartrate", "citrate",
+    "sulfate", "sulphate", "phosphate", "acetate", "fumarate", "bitartrate",
+    "dihydrate", "monohydrate", "trihydrate", "anhydrous",
+}
+
+# Cation-style stems that are not a drug on their own: "Ferrous Sulfate" and "Zinc Sulfate"
+# keep their salt word, otherwise they would normalize to "ferrous" / "zinc"
+SALT_STEMS = {
+    "ferrous", "ferric", "iron", "zinc", "lithium", "copper", "cupric", "aluminum", "aluminium",
+    "ammonium", "barium", "bismuth", "chromium", "cobalt", "manganese", "selenium", "silver",
+    "strontium", "lanthanum", "stannous",
+}
+
+# Dosage-form words that can trail a drug name ("Ibuprofen 400mg tablets")
+FORM_WORDS = {
+    "tablet", "tablets", "tab", "tabs", "caplet", "caplets", "capsule", "capsules", "cap", "caps",
+    "syrup", "suspension", "drops", "cream", "ointment", "gel", "injection", "inj",
+    "er", "xr", "sr", "cr", "xl", "forte",
+}
+
+_DOSE_RE = re.compile(r"\b\d+(?:[.,]\d+)?\s*(?:mg|mcg|µg|ug|g|ml|iu|%)(?:\s*/\s*\d*\s*(?:ml|g|tab))?\b", re.IGNORECASE)
+_PARENS_RE = re.compile(r"\([^)]*\)")
+_PUNCT_RE = re.compile(r"[^\w\s\-]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_synonyms = {}
+_brands = {}
+
+
+def load_synonym_map(path=None):
+    """
+    (Re)loads the synonym/brand map. Defaults to DRUG_SYNONYMS_PATH or the bundled
+    drug_synonyms.json. Missing or invalid files leave the maps empty.
+    """
+    global _synonyms, _brands
+    path = path or os.getenv("DRUG_SYNONYMS_PATH", DEFAULT_SYNONYMS_PATH)
+    synonyms, brands = {}, {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for alias, canonical in data.get("synonyms", {}).items():
+            synonyms[normalize_text(alias)] = normalize_text(canonical)
+        for brand, ingredients in data.get("brands", {}).items():
+            brands[normalize_text(brand)] = [canonical_key(i, _lookup=synonyms) for i in ingredients]
+    except FileNotFoundError:
+        print(f"Drug synonym map not found at {path}, using text normalization only.")
+    except Exception as e:
+        print(f"Error loading drug synonym map: {e}")
+
+    _synonyms, _brands = synonyms, brands
+    _canonical_cached.cache_clear()
+    return len(synonyms), len(brands)
+
+
+def normalize_text(name):
+    """Lowercases, drops parentheses/punctuation, dose strengths and trailing form/salt words."""
+    if not name or not isinstance(name, str):
+        return ""
+    text = _PARENS_RE.sub(" ", name.lower())
+    text = _DOSE_RE.sub(" ", text)
+    text = _PUNCT_RE.sub(" ", text)
+    words = _WHITESPACE_RE.sub(" ", text).strip().split(" ")
+
+    # Drop trailing dosage forms, then trailing salts, but never strip the name down to a salt
+    # or cation ("Magnesium Sulfate", "Potassium Citrate" and "Ferrous Sulfate" stay as they are)
+    while len(words) > 1 and words[-1] in FORM_WORDS:
+        words.pop()
+    while len(words) > 1 and words[-1] in SALT_WORDS and words[-2] not in SALT_WORDS and words[-2] not in SALT_STEMS:
+        words.pop()
+    return " ".join(w for w in words if w)
+
+
+@lru_cache(maxsize=8192)
+def _canonical_cached(name):
+    return canonical_key(name, _lookup=_synonyms)
+
+
+def canonical_key(name, _lookup=None):
+    """
+    Canonical lowercase key for a drug name: normalized text mapped through the synonym table.
+    This is what every cache key and DB lookup should use.
+    """
+    if _lookup is None:
+        return _canonical_cached(name) if isinstance(name, str) else ""
+    text = normalize_text(name)
+    return _lookup.get(text, text)
+
+
+def brand_ingredients(name):
+    """Returns the known ingredient list for a combination brand, or None."""
+    ingredients = _brands.get(normalize_text(name))
+    return list(ingredients) if ingredients else None
+
+
+def known_aliases():
+    """All aliases from the synonym/brand map: {alias: canonical name or "a + b" for combination brands}."""
+    aliases = dict(_synonyms)
+    for brand, ingredients in _brands.items():
+        aliases[brand] = " + ".join(ingredients)
+    return aliases
+
+
+def canonicalize_drug_list(drug_names):
+    """
+    Deduplicates a list of raw names by canonical key, keeping the first spelling seen.
+    Returns a list of (canonical_key, original_name) tuples.
+    """
+    seen = set()
+    result = []
+    for name in drug_names:
+        key = canonical_key(name)
+        if key and key not in seen:
+            seen.add(key)
+            result.append((key, name.strip()))
+    return result
+
+
+load_synonym_map()
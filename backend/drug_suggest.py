@@ -0,0 +1,131 @@
+import time
+import threading
+from bisect import bisect_left
+
+from drug_names import known_aliases
+
+# --- DRUG NAME AUTOCOMPLETE ---
+# Sorted-array prefix index over every Drug name in the graph plus known brand
+# and synonym aliases. A lookup is two bisects plus a bounded scan, so it is
+# cheap enough to run on every keystroke. The index is immutable; rebuilds
+# create a new one in the background and swap it in atomically.
+
+MAX_SCAN = 400  # Upper bound on candidates ranked per lookup
+FALLBACK_RETRY_SECONDS = 30  # How often an index built from fallback data tries the graph again
+
+
+def _fold(text):
+    return " ".join((text or "").lower().split())
+
+
+class SuggestIndex:
+    """Immutable prefix index. Entries are (name, kind, canonical) tuples."""
+
+    def __init__(self, entries):
+        keys = []
+        self.entries = []
+        seen = set()
+        for name, kind, canonical in entries:
+            folded = _fold(name)
+            if not folded or (folded, kind) in seen:
+                continue
+            seen.add((folded, kind))
+            entry_id = len(self.entries)
+            self.entries.append((name, kind, canonical))
+            # Index the full name and every later word, so "sodium" finds "Naproxen Sodium"
+            words = folded.split(" ")
+            for i in range(len(words)):
+                keys.append((" ".join(words[i:]), i, entry_id))
+        keys.sort()
+        self.keys = [k[0] for k in keys]
+        self.refs = [(k[1], k[2]) for k in keys]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def suggest(self, query, limit=10):
+        prefix = _fold(query)
+        if not prefix:
+            return []
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "￿", lo=start)
+
+        best = {}
+        for position in range(start, min(end, start + MAX_SCAN)):
+            word_offset, entry_id = self.refs[position]
+            name, kind, canonical = self.entries[entry_id]
+            # Rank: exact match, then whole-name prefix over later-word prefix,
+            # then graph drugs over aliases, then shorter names, then alphabetical
+            rank = (
+                0 if self.keys[position] == prefix and word_offset == 0 else 1,
+                word_offset > 0,
+                kind != "drug",
+                len(name),
+                name.lower(),
+            )
+            if entry_id not in best or rank < best[entry_id]:
+                best[entry_id] = rank
+
+        ranked = sorted(best.items(), key=lambda item: item[1])[:limit]
+        results = []
+        for entry_id, _ in ranked:
+            name, kind, canonical = self.entries[entry_id]
+            suggestion = {"name": name, "type": kind}
+            if canonical:
+                suggestion["canonical"] = canonical
+            results.append(suggestion)
+        return results
+
+
+class DrugSuggester:
+    """
+    Holds the current SuggestIndex and rebuilds it from a name source in the background.
+    `fetch_drug_names()` returns (names, reliable); an index built from fallback names
+    (graph unreachable) is rebuilt on a later lookup once FALLBACK_RETRY_SECONDS have passed.
+    """
+
+    def __init__(self, fetch_drug_names, retry_seconds=FALLBACK_RETRY_SECONDS):
+        self.fetch_drug_names = fetch_drug_names
+        self.retry_seconds = retry_seconds
+        self.index = SuggestIndex([])
+        self.building = False
+        self.from_fallback = True
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+
+    def build(self):
+        drug_names, reliable = self.fetch_drug_names()
+        drug_names = drug_names or []
+        entries = [(name, "drug", None) for name in drug_names]
+        for alias, target in known_aliases().items():
+            entries.append((alias.title(), "alias", target))
+        new_index = SuggestIndex(entries)
+        self.index = new_index
+        self.from_fallback = not reliable
+        self.built_at = time.monotonic()
+        print(f"Drug suggestion index built: {len(new_index)} names{' (fallback data)' if not reliable else ''}")
+        return new_index
+
+    def rebuild_in_background(self):
+        """Starts a rebuild unless one is already running; lookups keep using the old index."""
+        with self._lock:
+            if self.building:
+                return False
+            self.building = True
+
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                self.built_at = time.monotonic()
+                print(f"Drug suggestion index rebuild failed: {e}")
+            finally:
+                self.building = False
+
+        threading.Thread(target=run, name="suggest-index", daemon=True).start()
+        return True
+
+    def suggest(self, query, limit=10):
+        if self.from_fallback and not self.building and time.monotonic() - self.built_at >= self.retry_seconds:
+            self.rebuild_in_background()
+        return self.index.suggest(query, limit)
@@ -0,0 +1,74 @@
+import os
+import time
+import threading
+
+# --- GRAPH VERSION WATCHER ---
+# import_data.py stamps the graph with a version. The watcher polls that stamp
+# (one tiny query every GRAPH_VERSION_CHECK_SECONDS) and, when it changes, drops
+# the cache namespaces that hold graph data. The version the cache was built
+# against is stored in the cache itself ("meta" namespace), so with a shared
+# backend only the first worker to notice a new version clears it, and a
+# restored snapshot from the same graph version stays valid.
+
+DEFAULT_CHECK_INTERVAL = float(os.getenv("GRAPH_VERSION_CHECK_SECONDS", "30"))
+
+
+class GraphVersionWatcher:
+    def __init__(self, cache, fetch_version, interval=DEFAULT_CHECK_INTERVAL, on_change=None):
+        self.cache = cache
+        # Per-process callbacks fired when this process sees the version change (e.g. index rebuilds)
+        self.on_change = list(on_change or [])
+        self.fetch_version = fetch_version
+        self.interval = interval
+        self.current_version = None
+        self.last_checked = None
+        self.invalidations = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Compares the graph's version with the cache's; invalidates graph namespaces on change."""
+        self.last_checked = time.time()
+        version = self.fetch_version(timeout=2.0)
+        if version is None:
+            return False
+        previous_version, self.current_version = self.current_version, version
+        if previous_version is not None and previous_version != version:
+            for callback in self.on_change:
+                callback(version)
+
+        cached_version = self.cache.backend.get("meta", "graph_version")
+        if cached_version == version:
+            return False
+
+        self.cache.invalidate_namespaces(self.cache.GRAPH_NAMESPACES)
+        self.cache.backend.set("meta", "graph_version", version)
+        self.invalidations += 1
+        print(f"Graph version changed ({cached_version} -> {version}): cleared {', '.join(self.cache.GRAPH_NAMESPACES)} caches")
+        return True
+
+    def _run(self, wait_for):
+        if wait_for is not None:
+            wait_for.wait()
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Graph version watcher error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self, wait_for=None):
+        """Starts polling in a daemon thread (optionally after `wait_for`, e.g. cache warm-up, is set)."""
+        self._thread = threading.Thread(target=self._run, args=(wait_for,), name="graph-version-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def to_dict(self):
+        return {
+            "graph_version": self.current_version,
+            "cache_graph_version": self.cache.backend.get("meta", "graph_version"),
+            "last_checked": self.last_checked,
+            "invalidations": self.invalidations,
+        }
@@ -1,3 +1,6 @@
+import time
+import uuid
+
 try:
     import pandas as pd
     from neo4j import GraphDatabase
@@ -27,6 +30,14 @@ SET r.ID = toInteger(row.interaction_id),
     r.description = row.desc
 """
 
+# Version stamp read by the serving layer (database.get_graph_version) to invalidate its caches
+version_query = """
+MERGE (v:GraphVersion {id: 'current'})
+SET v.version = $version,
+    v.imported_at = datetime(),
+    v.rows = $rows
+"""
+
 if __name__ == "__main__":
     print("1. Reading CSV file...")
     try:
@@ -89,6 +100,11 @@ if __name__ == "__main__":
                 for batch in tqdm(batches, desc="Importing", unit="batch"):
                     session.execute_write(lambda tx: tx.run(import_query, rows=batch))
 
+                # 3. Stamp the graph version so running servers drop stale cached drugs/interactions
+                graph_version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+                session.run(version_query, version=graph_version, rows=len(data))
+                print(f"   Graph version stamped: {graph_version}")
+
         print("\nSuccess! Data normalized and imported.")
 
     except Exception as e:
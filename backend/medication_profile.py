@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from drug_names import canonical_key
+
+# --- SESSION MEDICATION PROFILES ---
+# A conversation usually adds one medication per turn. Instead of re-checking
+# every pair of the whole list each turn, a profile remembers which drugs have
+# already been evaluated against each other: adding drug K+1 queries only its
+# K new pairs, and removing a drug just drops the interactions it was part of.
+#
+# Invariant: every pair of drugs in `evaluated` has been checked, so only
+# positive findings need to be stored.
+
+MAX_SESSIONS = int(os.getenv("PROFILE_MAX_SESSIONS", "1000"))
+SESSION_IDLE_SECONDS = float(os.getenv("PROFILE_IDLE_SECONDS", "3600"))
+
+
+class MedicationProfile:
+    def __init__(self):
+        self.drugs = OrderedDict()   # canonical key -> display name
+        self.evaluated = set()       # canonical keys already checked against every other evaluated drug
+        self.interactions = {}       # (key_a, key_b) sorted -> interaction dict
+        self.by_drug = {}            # canonical key -> set of interaction pair keys
+        self.pairs_checked = 0
+        self.lock = threading.Lock()
+
+    def add(self, names):
+        """Adds drugs to the profile (already-known names are ignored)."""
+        with self.lock:
+            for name in names:
+                key = canonical_key(name)
+                if key and key not in self.drugs:
+                    self.drugs[key] = name.strip()
+
+    def sync(self, names):
+        """Makes the profile exactly `names` (e.g. the client's medication list), dropping removed drugs."""
+        keep = {canonical_key(name) for name in names} - {""}
+        with self.lock:
+            for key in [k for k in self.drugs if k not in keep]:
+                self._remove(key)
+        self.add(names)
+
+    def remove(self, name):
+        with self.lock:
+            self._remove(canonical_key(name))
+
+    def _remove(self, key):
+        # Caller holds the lock
+        self.drugs.pop(key, None)
+        self.evaluated.discard(key)
+        for pair in self.by_drug.pop(key, ()):
+            self.interactions.pop(pair, None)
+            other = pair[0] if pair[1] == key else pair[1]
+            self.by_drug.get(other, set()).discard(pair)
+
+    def _store(self, interaction):
+        # Caller holds the lock
+        a, b = canonical_key(interaction.get("drug_a")), canonical_key(interaction.get("drug_b"))
+        if not a or not b or a == b or a not in self.drugs or b not in self.drugs:
+            return
+        pair = (a, b) if a < b else (b, a)
+        self.interactions[pair] = interaction
+        self.by_drug.setdefault(a, set()).add(pair)
+        self.by_drug.setdefault(b, set()).add(pair)
+
+    def evaluate(self, fetch):
+        """
+        Checks only the pairs involving not-yet-evaluated drugs and returns every known
+        interaction in the profile. `fetch(new_names, all_names)` must return
+        (interactions, reliable); unreliable (fallback) results are used for this turn
+        but the drugs stay pending so they are re-checked next time.
+        """
+        with self.lock:
+            pending = [key for key in self.drugs if key not in self.evaluated]
+            if pending and len(self.drugs) > 1:
+                new_names = [self.drugs[key] for key in pending]
+                interactions, reliable = fetch(new_names, list(self.drugs.values()))
+                for interaction in interactions:
+                    self._store(interaction)
+                already = len(self.drugs) - len(pending)
+                self.pairs_checked += len(pending) * already + len(pending) * (len(pending) - 1) // 2
+                if reliable:
+                    self.evaluated.update(pending)
+            elif pending:
+                # A single drug has no pairs yet; it is trivially evaluated
+                self.evaluated.update(pending)
+            return list(self.interactions.values())
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "drugs": list(self.drugs.values()),
+                "pending": [self.drugs[k] for k in self.drugs if k not in self.evaluated],
+                "interactions": len(self.interactions),
+                "pairs_checked": self.pairs_checked,
+            }
+
+
+class SessionProfiles:
+    """Bounded LRU of MedicationProfile per session id; idle sessions expire."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self._profiles = OrderedDict()  # session id -> (profile, last used)
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Returns the session's profile, creating it if needed (None without a usable session id)."""
+        # The id comes straight from the client; anything but a non-empty string means no session
+        if not isinstance(session_id, str) or not session_id.strip() or self.max_sessions <= 0:
+            return None
+        now = self.clock()
+        with self._lock:
+            entry = self._profiles.get(session_id)
+            if entry is None or now - entry[1] > self.idle_seconds:
+                profile = MedicationProfile()
+            else:
+                profile = entry[0]
+            self._profiles[session_id] = (profile, now)
+            self._profiles.move_to_end(session_id)
+            while len(self._profiles) > self.max_sessions:
+                self._profiles.popitem(last=False)
+            return profile
+
+    def clear(self):
+        """Drops every profile (e.g. the graph changed, so evaluated pairs are stale)."""
+        with self._lock:
+            self._profiles.clear()
+
+    def __len__(self):
+        return len(self._profiles)
+
+
+session_profiles = SessionProfiles()
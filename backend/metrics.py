@@ -1,4 +1,7 @@
 import time
+import threading
+from array import array
+from bisect import bisect_left
 from collections import deque
 
 # In-memory storage for metrics
@@ -46,6 +49,162 @@ def update_metrics(response_time, db_attempted, db_successful, llm_attempted, ll
     metrics["Database interactions"] += db_interactions
     metrics["Gemini Interactions"] += llm_interactions
 
+    metrics_history.record_request(response_time, llm_calls=llm_attempted, db_calls=db_attempted)
+
 def get_metrics():
     """Return the current metrics."""
     return metrics
+
+
+# --- TIME SERIES HISTORY ---
+# Fixed-memory ring buffers at three resolutions (1s, 1m, 1h). Every slot is
+# preallocated at import time and reused in place when the ring wraps, so
+# recording never allocates and memory stays constant however long the process
+# runs. Latency percentiles come from a small log-spaced histogram per slot.
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 12.0, 20.0, 30.0, 60.0)
+NUM_BUCKETS = len(LATENCY_BUCKETS) + 1
+
+COUNTER_FIELDS = ("requests", "latency_sum", "cache_hits", "cache_misses", "llm_calls", "db_calls")
+
+# name -> (seconds per slot, number of slots)
+RESOLUTIONS = {
+    "1s": (1, 300),     # last 5 minutes
+    "1m": (60, 180),    # last 3 hours
+    "1h": (3600, 168),  # last 7 days
+}
+
+
+class RingSeries:
+    """One resolution: `slots` buckets of `step` seconds, each tagged with the period it holds."""
+
+    def __init__(self, step, slots):
+        self.step = step
+        self.slots = slots
+        self.periods = array('q', [-1]) * slots
+        self.counters = {field: array('d', [0.0]) * slots for field in COUNTER_FIELDS}
+        self.latency = array('L', [0]) * (slots * NUM_BUCKETS)
+
+    def _slot(self, now):
+        period = int(now // self.step)
+        index = period % self.slots
+        if self.periods[index] != period:
+            # The ring wrapped: reuse the slot for the new period
+            self.periods[index] = period
+            for values in self.counters.values():
+                values[index] = 0.0
+            base = index * NUM_BUCKETS
+            for b in range(NUM_BUCKETS):
+                self.latency[base + b] = 0
+        return index
+
+    def add(self, now, field, amount):
+        self.counters[field][self._slot(now)] += amount
+
+    def add_latency(self, now, seconds):
+        index = self._slot(now)
+        self.counters["requests"][index] += 1
+        self.counters["latency_sum"][index] += seconds
+        self.latency[index * NUM_BUCKETS + bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+def _percentile(histogram, total, fraction):
+    """Upper bound of the bucket holding the given fraction of samples (None when empty)."""
+    if total <= 0:
+        return None
+    target = total * fraction
+    seen = 0
+    for b, count in enumerate(histogram):
+        seen += count
+        if seen >= target:
+            return LATENCY_BUCKETS[b] if b < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+    return LATENCY_BUCKETS[-1]
+
+
+class MetricsHistory:
+    def __init__(self, resolutions=RESOLUTIONS, clock=time.time):
+        self.clock = clock
+        self.series = {name: RingSeries(step, slots) for name, (step, slots) in resolutions.items()}
+        self._lock = threading.Lock()
+
+    def record_request(self, response_time, llm_calls=0, db_calls=0):
+        now = self.clock()
+        with self._lock:
+            for ring in self.series.values():
+                ring.add_latency(now, response_time)
+                if llm_calls:
+                    ring.add(now, "llm_calls", llm_calls)
+                if db_calls:
+                    ring.add(now, "db_calls", db_calls)
+
+    def record_cache(self, hits, misses):
+        now = self.clock()
+        with self._lock:
+            for ring in self.series.values():
+                if hits:
+                    ring.add(now, "cache_hits", hits)
+                if misses:
+                    ring.add(now, "cache_misses", misses)
+
+    def history(self, resolution="1m", points=60):
+        """
+        Returns the most recent slots of one resolution, downsampled to at most `points`
+        points by merging adjacent slots. Empty periods are reported as zeros.
+        """
+        ring = self.series[resolution]
+        points = max(1, min(points, ring.slots))
+        group = -(-ring.slots // points)  # ceil: slots merged into each returned point
+        points = ring.slots // group
+
+        merged = {field: [0.0] * points for field in COUNTER_FIELDS}
+        merged_latency = [[0] * NUM_BUCKETS for _ in range(points)]
+
+        with self._lock:
+            current = int(self.clock() // ring.step)
+            first_period = current - points * group + 1
+            for offset in range(points * group):
+                period = first_period + offset
+                index = period % ring.slots
+                if ring.periods[index] != period:
+                    continue
+                point = offset // group
+                for field in COUNTER_FIELDS:
+                    merged[field][point] += ring.counters[field][index]
+                base = index * NUM_BUCKETS
+                histogram = merged_latency[point]
+                for b in range(NUM_BUCKETS):
+                    histogram[b] += ring.latency[base + b]
+
+        point_seconds = ring.step * group
+        series = {
+            "timestamps": [(first_period + p * group) * ring.step for p in range(points)],
+            "requests": [int(v) for v in merged["requests"]],
+            "request_rate": [round(v / point_seconds, 4) for v in merged["requests"]],
+            "latency_avg": [],
+            "latency_p50": [],
+            "latency_p95": [],
+            "latency_p99": [],
+            "cache_hit_rate": [],
+            "llm_calls": [int(v) for v in merged["llm_calls"]],
+            "db_calls": [int(v) for v in merged["db_calls"]],
+        }
+        for p in range(points):
+            total = merged["requests"][p]
+            histogram = merged_latency[p]
+            series["latency_avg"].append(round(merged["latency_sum"][p] / total, 4) if total else None)
+            series["latency_p50"].append(_percentile(histogram, total, 0.50))
+            series["latency_p95"].append(_percentile(histogram, total, 0.95))
+            series["latency_p99"].append(_percentile(histogram, total, 0.99))
+            lookups = merged["cache_hits"][p] + merged["cache_misses"][p]
+            series["cache_hit_rate"].append(round(merged["cache_hits"][p] / lookups, 4) if lookups else None)
+
+        return {"resolution": resolution, "step_seconds": point_seconds, "points": points, "series": series}
+
+
+metrics_history = MetricsHistory()
+
+
+def record_cache_lookups(hits, misses):
+    """Feeds QueryCache hit/miss counts into the time series."""
+    metrics_history.record_cache(hits, misses)
@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- STAGE GRAPH EXECUTOR ---
+# Runs the stages of a request as a small dependency graph: every stage starts
+# as soon as the stages it depends on have finished, so independent work (e.g.
+# Gemini extraction and DB lookups for the client-provided drugList) overlaps
+# instead of running back to back.
+#
+# Stages never wait on each other themselves; only the calling thread waits,
+# so a shared pool cannot deadlock no matter how many requests use it.
+
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("STAGE_WORKERS", "16")),
+    thread_name_prefix="stage"
+)
+
+
+class StageGraph:
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+
+    def add(self, name, fn, deps=()):
+        """
+        Registers a stage. `fn` is called with one keyword argument per dependency,
+        named after that dependency and holding its result.
+        """
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = (fn, tuple(deps))
+        return self
+
+    def _timed(self, name, fn, kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(**kwargs)
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    def run(self, pool=None):
+        """Executes every stage and returns {stage_name: result}. Stage exceptions are re-raised."""
+        pool = pool or executor
+        pending = dict(self.stages)
+        results = {}
+        running = {}
+
+        while pending or running:
+            for name, (fn, deps) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    kwargs = {dep: results[dep] for dep in deps}
+                    running[pool.submit(self._timed, name, fn, kwargs)] = name
+                    del pending[name]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    for other in running:
+                        other.cancel()
+                    raise error
+                results[name] = future.result()
+
+        return results
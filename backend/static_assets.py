@@ -0,0 +1,141 @@
+import os
+import json
+import mimetypes
+from flask import Response, send_file
+from werkzeug.security import safe_join
+# --- STATIC FRONTEND SERVING ---
+# Serves frontend/ from the backend using the variants produced by build_assets.py:
+#   - images: AVIF or WebP when the browser's Accept header allows it
+#   - text:   brotli or gzip precompressed copies per Accept-Encoding
+# Every representation has its own strong ETag. Requests carrying the current
+# content hash as ?v=<hash> are cached as immutable; anything else must revalidate
+# (a cheap 304 when unchanged). Without a manifest the original files are served,
+# versioned by hashes computed here, so ?v= URLs still work without a build step.
+
+from build_assets import FRONTEND_DIR, BUILD_DIRNAME, MANIFEST_NAME, file_hash
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, max-age=0, must-revalidate"
+
+# Preferred order for content negotiation
+IMAGE_TYPES = ("image/avif", "image/webp")
+ENCODINGS = ("br", "gzip")
+
+
+def _accepts(header, token):
+    """True if `token` appears in an Accept/Accept-Encoding header without q=0."""
+    for part in (header or "").split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if fields[0].lower() == token:
+            return not any(f.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000") for f in fields[1:])
+    return False
+
+
+class StaticAssets:
+    def __init__(self, root=FRONTEND_DIR):
+        self.root = root
+        self.build_dir = os.path.join(root, BUILD_DIRNAME)
+        self.assets = {}
+        self._fallback_hashes = {}
+        self.reload()
+
+    def reload(self):
+        """Re-reads the build manifest (e.g. after running build_assets.py)."""
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                self.assets = json.load(f).get("assets", {})
+        except FileNotFoundError:
+            self.assets = {}
+            print("No static asset manifest found, serving original frontend files (run build_assets.py)")
+        except Exception as e:
+            self.assets = {}
+            print(f"Error loading static asset manifest: {e}")
+        self._fallback_hashes = {}
+
+    def version(self, rel_path):
+        """Content hash of a source file, from the manifest or computed once per (mtime, size)."""
+        entry = self.assets.get(rel_path)
+        if entry:
+            return entry["hash"]
+        path = safe_join(self.root, rel_path)
+        if not path or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._fallback_hashes.get(rel_path)
+        if cached is None or cached[0] != stamp:
+            cached = self._fallback_hashes[rel_path] = (stamp, file_hash(path))
+        return cached[1]
+
+    def versions(self):
+        """{relative path: content hash} for every frontend file, from the manifest or computed."""
+        if self.assets:
+            return {rel_path: entry["hash"] for rel_path, entry in self.assets.items()}
+        versions = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith(".")
+                                 and os.path.join(dirpath, d) != self.build_dir)
+            for filename in sorted(filenames):
+                if filename.startswith("."):
+                    continue
+                rel_path = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                versions[rel_path] = self.version(rel_path)
+        return versions
+
+    def resolve(self, rel_path, accept="", accept_encoding=""):
+        """
+        Picks the representation to send. Returns a dict with the file path, mimetype,
+        content encoding, ETag and Vary header, or None if the asset does not exist.
+        """
+        source = safe_join(self.root, rel_path)
+        if not source or os.path.commonpath([source, self.build_dir]) == self.build_dir or not os.path.isfile(source):
+            return None
+
+        mimetype = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+        version = self.version(rel_path)
+        chosen = {"path": source, "mimetype": mimetype, "encoding": None,
+                  "etag": f"{version}-id", "vary": None, "version": version}
+
+        entry = self.assets.get(rel_path)
+        if entry and entry["hash"] == version:
+            variants = {v["type"]: v for v in entry.get("variants", [])}
+            if variants:
+                chosen["vary"] = "Accept"
+                for image_type in IMAGE_TYPES:
+                    if image_type in variants and _accepts(accept, image_type):
+                        variant = variants[image_type]
+                        chosen.update(path=os.path.join(self.build_dir, variant["file"]), mimetype=image_type,
+                                      etag=f"{variant['hash']}-{image_type.split('/')[1]}")
+                        break
+            encodings = entry.get("encodings", {})
+            if encodings:
+                chosen["vary"] = "Accept-Encoding"
+                for encoding in ENCODINGS:
+                    if encoding in encodings and _accepts(accept_encoding, encoding):
+                        chosen.update(path=os.path.join(self.build_dir, encodings[encoding]["file"]),
+                                      encoding=encoding, etag=f"{version}-{encoding}")
+                        break
+        return chosen
+
+    def response(self, rel_path, request):
+        chosen = self.resolve(rel_path, request.headers.get("Accept", ""), request.headers.get("Accept-Encoding", ""))
+        if chosen is None:
+            return None
+
+        immutable = request.args.get("v") == chosen["version"] and not rel_path.endswith(".html")
+        headers = {
+            "ETag": f'"{chosen["etag"]}"',
+            "Cache-Control": IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE,
+        }
+        if chosen["vary"]:
+            headers["Vary"] = chosen["vary"]
+
+        if_none_match = request.headers.get("If-None-Match", "")
+        if headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status=304, headers=headers)
+
+        response = send_file(chosen["path"], mimetype=chosen["mimetype"], conditional=False, etag=False, max_age=None)
+        if chosen["encoding"]:
+            response.headers["Content-Encoding"] = chosen["encoding"]
+        response.headers.update(headers)
+        return response
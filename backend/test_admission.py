@@ -0,0 +1,58 @@
+import time
+import threading
+import unittest
+from admission import AdmissionController, AdmissionRejected, classify_priority, EMERGENCY, NORMAL
+
+
+class TestAdmission(unittest.TestCase):
+
+    def test_classifier(self):
+        self.assertEqual(classify_priority("I have chest pain after taking this"), EMERGENCY)
+        self.assertEqual(classify_priority("saya sesak napas setelah minum obat"), EMERGENCY)
+        self.assertEqual(classify_priority("Can I take ibuprofen with coffee?"), NORMAL)
+        self.assertEqual(classify_priority("My lips and tongue are swelling after amoxicillin"), EMERGENCY)
+        self.assertEqual(classify_priority("wajah saya bengkak setelah minum obat"), EMERGENCY)
+        self.assertEqual(classify_priority("Does ibuprofen help with swelling?"), NORMAL)
+        self.assertEqual(classify_priority("Obat untuk bengkak kaki apa?"), NORMAL)
+
+    def test_queue_full_is_shed_but_emergency_is_queued(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=0, max_wait=0.2)
+        controller.acquire()
+        with self.assertRaises(AdmissionRejected) as ctx:
+            controller.acquire(NORMAL)
+        self.assertEqual(ctx.exception.reason, "queue_full")
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+        with self.assertRaises(AdmissionRejected) as ctx:
+            controller.acquire(EMERGENCY)
+        self.assertEqual(ctx.exception.reason, "queue_timeout")
+        stats = controller.get_stats()
+        self.assertEqual((stats["rejected_queue_full"], stats["rejected_timeout"], stats["queue_depth"]), (1, 1, 0))
+
+    def test_emergency_jumps_the_queue(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=5, max_wait=2)
+        controller.acquire()
+        order = []
+
+        def worker(name, priority):
+            controller.acquire(priority)
+            order.append(name)
+            controller.release(0.01)
+
+        threads = [threading.Thread(target=worker, args=("normal", NORMAL))]
+        threads[0].start()
+        time.sleep(0.05)
+        threads.append(threading.Thread(target=worker, args=("emergency", EMERGENCY)))
+        threads[1].start()
+        time.sleep(0.05)
+        self.assertEqual(controller.get_stats()["queue_depth"], 2)
+
+        controller.release(0.01)
+        for t in threads:
+            t.join(2)
+        self.assertEqual(order, ["emergency", "normal"])
+        self.assertEqual(controller.get_stats()["admitted_emergency"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
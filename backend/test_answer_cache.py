@@ -0,0 +1,68 @@
+import unittest
+from answer_cache import AnswerCache, answer_cache_key, depersonalize, personalize
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAnswerCache(unittest.TestCase):
+
+    def test_key_uses_resolved_drug_set_not_text(self):
+        a = {"intent": "checking_safety", "found_drugs": ["Warfarin", "Aspirin"], "not_found_drugs": []}
+        b = {"intent": "checking_safety", "found_drugs": ["aspirin"], "not_found_drugs": ["WARFARIN "]}
+        self.assertEqual(answer_cache_key(a, "en"), answer_cache_key(b, "en"))
+        self.assertNotEqual(answer_cache_key(a, "en"), answer_cache_key(a, "id"))
+
+    def test_uncacheable_requests(self):
+        self.assertIsNone(answer_cache_key({"intent": "general_question", "found_drugs": ["Aspirin"]}, "en"))
+        self.assertIsNone(answer_cache_key({"intent": "checking_safety", "found_drugs": []}, "en"))
+        self.assertIsNone(answer_cache_key({"intent": "checking_safety", "found_drugs": ["Aspirin"], "degraded_stages": ["fuzzy_search"]}, "en"))
+
+    def test_qualified_questions_are_not_cached(self):
+        metadata = {"intent": "checking_safety", "found_drugs": ["Ibuprofen"]}
+        self.assertIsNotNone(answer_cache_key(metadata, "en", "Is ibuprofen safe?"))
+        for message in ["Is ibuprofen safe while pregnant?", "Is ibuprofen safe for my 5-year-old?",
+                        "Can I take 800 mg ibuprofen?", "Ibuprofen with kidney disease?",
+                        "Apakah ibuprofen aman untuk ibu hamil?", "Ibuprofen untuk anak umur 5 tahun?",
+                        "Ibuprofen aman untuk penderita maag?"]:
+            self.assertIsNone(answer_cache_key(metadata, "en", message), message)
+        self.assertIsNotNone(answer_cache_key(metadata, "id", "Apakah ibuprofen aman? Hati-hati ya"))
+
+    def test_symptom_descriptions_are_not_cached(self):
+        metadata = {"intent": "checking_safety", "found_drugs": ["Ibuprofen", "Warfarin"]}
+        self.assertEqual(answer_cache_key(metadata, "en", "is ibuprofen safe with warfarin?"), "en|checking_safety|ibuprofen+warfarin")
+        for message in ["I took ibuprofen with warfarin and now I have chest pain and can't breathe",
+                        "I fainted after taking ibuprofen with warfarin",
+                        "my throat is swelling after ibuprofen and warfarin",
+                        "saya minum ibuprofen dan warfarin lalu sesak napas",
+                        "I'm bleeding a lot since taking ibuprofen with warfarin",
+                        "I got a rash from ibuprofen and warfarin",
+                        "ibuprofen dan warfarin bikin gatal dan muntah"]:
+            self.assertIsNone(answer_cache_key(metadata, "en", message), message)
+
+    def test_user_name_placeholder(self):
+        stored = depersonalize("Hi Budi! Budiman, Budi should avoid this.", "Budi")
+        self.assertEqual(stored, "Hi {{user_name}}! Budiman, {{user_name}} should avoid this.")
+        self.assertEqual(personalize(stored, "Sari"), "Hi Sari! Budiman, Sari should avoid this.")
+
+    def test_ttl_and_size_limits(self):
+        clock = FakeClock()
+        cache = AnswerCache(max_entries=2, ttl=10, clock=clock)
+        cache.set("a", "Hello Budi", "happy", user_name="Budi")
+        cache.set("b", "B", "neutral")
+        self.assertEqual(cache.get("a", user_name="Sari"), ("Hello Sari", "happy"))
+        cache.set("c", "C", "neutral")
+        self.assertIsNone(cache.get("b"))  # "a" was used more recently, so "b" was evicted
+        clock.now = 11
+        self.assertIsNone(cache.get("a"))
+        stats = cache.get_stats()
+        self.assertEqual((stats["evicted"], stats["expired"]), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
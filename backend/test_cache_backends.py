@@ -0,0 +1,137 @@
+import os
+import shutil
+import fnmatch
+import tempfile
+import threading
+import unittest
+import socketserver
+
+from cache_backends import InMemoryBackend, SQLiteBackend, RedisBackend
+
+
+# --- LOCAL REDIS STAND-IN ---
+# Just enough of the Redis protocol for RedisBackend: GET/SET/MGET/MSET/DEL/SCAN.
+class _FakeRedisHandler(socketserver.StreamRequestHandler):
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            cmd = args[0].upper()
+            with self.server.lock:
+                if cmd in (b"PING", b"SELECT", b"AUTH", b"SET", b"MSET"):
+                    for i in range(1, len(args) - 1, 2):
+                        if cmd in (b"SET", b"MSET"):
+                            store[args[i]] = args[i + 1]
+                    reply = b"+OK\r\n" if cmd != b"PING" else b"+PONG\r\n"
+                elif cmd == b"GET":
+                    reply = self._bulk(store.get(args[1]))
+                elif cmd == b"MGET":
+                    reply = b"*%d\r\n" % (len(args) - 1) + b"".join(self._bulk(store.get(k)) for k in args[1:])
+                elif cmd == b"DEL":
+                    removed = sum(1 for k in args[1:] if store.pop(k, None) is not None)
+                    reply = b":%d\r\n" % removed
+                elif cmd == b"SCAN":
+                    pattern = args[args.index(b"MATCH") + 1].decode()
+                    keys = [k for k in store if fnmatch.fnmatchcase(k.decode(), pattern)]
+                    reply = b"*2\r\n" + self._bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(self._bulk(k) for k in keys)
+                else:
+                    reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+class _FakeRedisServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeRedisHandler)
+        self.store = {}
+        self.lock = threading.Lock()
+
+
+class BackendContract:
+    """Behaviour every backend must share."""
+
+    def test_get_set_and_batch(self):
+        backend = self.backend
+        self.assertIsNone(backend.get("drug", "aspirin"))
+        backend.set("drug", "aspirin", {"id": 1, "name": "Aspirin"})
+        backend.set_many("drug", {"ibuprofen": {"id": 2, "name": "Ibuprofen"}, "naproxen": {"id": 3, "name": "Naproxen"}})
+        self.assertEqual(backend.get("drug", "aspirin"), {"id": 1, "name": "Aspirin"})
+        found = backend.get_many("drug", ["aspirin", "naproxen", "missing"])
+        self.assertEqual(set(found), {"aspirin", "naproxen"})
+        self.assertEqual(backend.size("drug"), 3)
+
+    def test_namespaces_are_isolated(self):
+        backend = self.backend
+        backend.set("drug", "a", [1])
+        backend.set("interactions", "a", [2])
+        backend.clear("drug")
+        self.assertIsNone(backend.get("drug", "a"))
+        self.assertEqual(backend.get("interactions", "a"), [2])
+        self.assertEqual(dict(backend.items("interactions")), {"a": [2]})
+        backend.delete("interactions", "a")
+        self.assertEqual(backend.size("interactions"), 0)
+
+
+class TestInMemoryBackend(BackendContract, unittest.TestCase):
+
+    def setUp(self):
+        self.backend = InMemoryBackend()
+
+
+class TestSQLiteBackend(BackendContract, unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.backend = SQLiteBackend(os.path.join(self.tmp_dir, "cache.sqlite"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_shared_between_instances(self):
+        self.backend.set("drug", "aspirin", {"id": 1})
+        other = SQLiteBackend(self.backend.path)
+        self.assertEqual(other.get("drug", "aspirin"), {"id": 1})
+
+
+class TestRedisBackend(BackendContract, unittest.TestCase):
+
+    def setUp(self):
+        self.server = _FakeRedisServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.backend = RedisBackend.from_url(f"redis://{host}:{port}/0")
+
+    def tearDown(self):
+        self.backend._disconnect()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_unavailable_server_is_a_miss(self):
+        backend = RedisBackend("127.0.0.1", 1, timeout=0.2)
+        self.assertEqual(backend.get_many("drug", ["aspirin"]), {})
+        backend.set("drug", "aspirin", {"id": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
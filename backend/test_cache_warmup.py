@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from core_logic import QueryCache
+from cache_warmup import AccessStats, save_snapshot, load_snapshot
+
+
+class TestCacheWarmup(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "snapshot.json.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_access_stats_top_and_bound(self):
+        stats = AccessStats(max_keys=4)
+        for name, count in [("a", 5), ("b", 3), ("c", 1), ("d", 1), ("e", 2)]:
+            for _ in range(count):
+                stats.record_drug(name)
+        self.assertEqual(stats.top("drugs", 2), ["a", "b"])
+        self.assertLessEqual(len(stats.counters["drugs"]), 4)
+
+    def test_snapshot_roundtrip(self):
+        cache = QueryCache()
+        stats = AccessStats()
+        cache.set_drug("Paracetamol", {"id": 1, "name": "Acetaminophen"})
+        cache.set_ingredients("Panadol Extra", ["Acetaminophen", "Caffeine"])
+        cache.set_interactions("a|b", [{"drug_a": "A", "drug_b": "B", "description": "x"}])
+        stats.record_drug("acetaminophen")
+        self.assertTrue(save_snapshot(cache, stats, path=self.path))
+        self.assertEqual(os.listdir(self.tmp_dir), ["snapshot.json.gz"])  # no temp file left behind
+
+        restored_cache = QueryCache()
+        restored_stats = AccessStats()
+        self.assertEqual(load_snapshot(restored_cache, restored_stats, path=self.path), 3)
+        self.assertEqual(restored_cache.get_drug("Tylenol"), {"id": 1, "name": "Acetaminophen"})
+        self.assertEqual(restored_cache.get_interactions("a|b")[0]["description"], "x")
+        self.assertEqual(restored_stats.top("drugs", 1), ["acetaminophen"])
+
+    def test_missing_snapshot_is_ignored(self):
+        self.assertEqual(load_snapshot(QueryCache(), AccessStats(), path=self.path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
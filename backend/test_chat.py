@@ -0,0 +1,130 @@
+import os
+import copy
+import atexit
+import unittest
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import metrics
+import core_logic
+import app as karin_app
+from answer_cache import answer_cache, is_first_question
+
+atexit.unregister(karin_app.save_snapshot)  # Don't write a cache snapshot from the test run
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    def start_chat(self, history=None):
+        return self
+
+    def send_message(self, message, request_options=None):
+        self.calls += 1
+        return FakeResponse("[neutral] Budi, Warfarin and Aspirin raise bleeding risk.")
+
+
+INTRO = [
+    {"role": "user", "parts": ["Hi Karin. My name is Budi. I would like to consult about my health or medications."]},
+    {"role": "model", "parts": ["Hi Budi! How can I help?"]},
+]
+
+
+class TestChatAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (core_logic.model, core_logic.build_database_context)
+        # /chat updates the global counters; put them back so other tests see them untouched
+        self.saved_metrics = (copy.deepcopy(metrics.metrics), list(metrics.response_times), list(metrics.request_timestamps))
+        self.model = FakeModel()
+        core_logic.model = self.model
+        metadata = {"intent": "checking_safety", "found_drugs": ["Warfarin", "Aspirin"], "not_found_drugs": [], "ingredient_found_drugs": []}
+        core_logic.build_database_context = lambda *args, **kwargs: ("", dict(metadata))
+        answer_cache.clear()
+        self.client = karin_app.app.test_client()
+
+    def tearDown(self):
+        core_logic.model, core_logic.build_database_context = self.saved
+        saved_metrics, response_times, request_timestamps = self.saved_metrics
+        metrics.metrics.clear()
+        metrics.metrics.update(saved_metrics)
+        metrics.response_times.clear()
+        metrics.response_times.extend(response_times)
+        metrics.request_timestamps.clear()
+        metrics.request_timestamps.extend(request_timestamps)
+        answer_cache.clear()
+
+    def ask(self, user_name, history):
+        return self.client.post("/chat", json={"message": "Is warfarin safe with aspirin?", "history": history, "userName": user_name})
+
+    def test_first_question_after_intro_is_served_from_cache(self):
+        first = self.ask("Budi", INTRO)
+        second = self.ask("Sari", [{"role": "user", "parts": ["Hi Karin. My name is Sari."]}, {"role": "model", "parts": ["Hi Sari!"]}])
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(self.model.calls, 1)
+        self.assertTrue(second.get_json()["messages"][0].startswith("Sari, Warfarin"))
+
+    def test_follow_up_questions_are_not_cached(self):
+        follow_up = INTRO + [{"role": "user", "parts": ["I take warfarin."]}, {"role": "model", "parts": ["Noted."]}]
+        self.ask("Budi", follow_up)
+        self.ask("Budi", follow_up)
+        self.assertEqual(self.model.calls, 2)
+
+    def test_emergency_reports_are_not_served_from_cache(self):
+        self.ask("Budi", INTRO)
+        reply = self.client.post("/chat", json={"message": "I took warfarin with aspirin and now I have chest pain",
+                                                "history": INTRO, "userName": "Sari"})
+        self.assertEqual(reply.status_code, 200)
+        self.assertEqual(self.model.calls, 2)
+
+    def test_error_replies_are_not_logged(self):
+        logged = []
+
+        class FakeLogger:
+            def log(self, record):
+                logged.append(record)
+
+        def fail(message, request_options=None):
+            raise ConnectionError("Gemini unreachable")
+
+        saved_logger = karin_app.conversation_logger
+        karin_app.conversation_logger = FakeLogger()
+        try:
+            self.ask("Budi", INTRO)
+            self.model.send_message = fail
+            follow_up = INTRO + [{"role": "user", "parts": ["I take warfarin."]}, {"role": "model", "parts": ["Noted."]}]
+            reply = self.ask("Budi", follow_up)
+        finally:
+            karin_app.conversation_logger = saved_logger
+        self.assertIn("trouble connecting", reply.get_json()["messages"][0])
+        self.assertEqual(len(logged), 1)
+
+    def test_omitted_interactions_are_returned(self):
+        omitted = [{"drug_a": "Warfarin", "drug_b": "Aspirin", "description": "Bleeding risk.", "severity": "major"}]
+        metadata = {"intent": "checking_safety", "found_drugs": ["Warfarin"], "omitted_interactions": omitted}
+        core_logic.build_database_context = lambda *args, **kwargs: ("", dict(metadata))
+        first = self.ask("Budi", INTRO).get_json()
+        cached = self.ask("Sari", INTRO).get_json()
+        self.assertEqual(self.model.calls, 1)
+        self.assertEqual(first["omitted_interactions"], omitted)
+        self.assertEqual(cached["omitted_interactions"], omitted)
+
+    def test_malformed_session_id_is_ignored(self):
+        reply = self.client.post("/chat", json={"message": "Is warfarin safe with aspirin?", "history": INTRO,
+                                                "sessionId": ["not", "a", "string"]})
+        self.assertEqual(reply.status_code, 200)
+
+    def test_is_first_question(self):
+        self.assertTrue(is_first_question([]))
+        self.assertTrue(is_first_question(INTRO))
+        self.assertFalse(is_first_question(INTRO + [{"role": "user", "parts": ["And ibuprofen?"]}]))
+
+
+if __name__ == '__main__':
+    unittest.main()
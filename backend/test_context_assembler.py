@@ -0,0 +1,41 @@
+import unittest
+from context_assembler import assemble_interaction_sections, rank_interactions, severity_of
+
+
+class TestContextAssembler(unittest.TestCase):
+
+    def test_severity_ranking_and_synonym_dedupe(self):
+        interactions = [
+            {"drug_a": "DrugA", "drug_b": "DrugB", "description": "DrugA may decrease the absorption of DrugB."},
+            {"drug_a": "Warfarin", "drug_b": "Aspirin", "description": "The risk of bleeding can be increased."},
+            {"drug_a": "Paracetamol", "drug_b": "DrugC", "description": "Interaction one"},
+            {"drug_a": "DrugC", "drug_b": "Acetaminophen", "description": "Interaction one (duplicate)"},
+        ]
+        ranked = rank_interactions(interactions, mentioned_drugs=["drugc"])
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(ranked[0][0]["drug_a"], "Warfarin")
+        self.assertEqual(severity_of("The risk of bleeding can be increased."), 3)
+
+    def test_budget_overflow_goes_to_side_channel(self):
+        interactions = [
+            {"drug_a": f"Drug{i:03d}", "drug_b": f"Drug{i + 1:03d}", "description": "x" * 200}
+            for i in range(20)
+        ]
+        parts, overflow = assemble_interaction_sections(
+            [("[DATABASE] Direct Drug Interactions Found:", interactions), ("[DATABASE] Other:", [])],
+            token_budget=300
+        )
+        kept = parts[0].count("<li>")
+        self.assertGreater(kept, 0)
+        self.assertEqual(kept + len(overflow), 20)
+        self.assertIn("omitted", parts[-1])
+
+    def test_everything_fits(self):
+        interactions = [{"drug_a": "A", "drug_b": "B", "description": "short"}]
+        parts, overflow = assemble_interaction_sections([("Header:", interactions)], token_budget=1000)
+        self.assertEqual(overflow, [])
+        self.assertEqual(parts, ["Header:\n<ul><li><b>A</b> + <b>B</b>: short</li></ul>"])
+
+
+if __name__ == '__main__':
+    unittest.main()
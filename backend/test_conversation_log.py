@@ -0,0 +1,57 @@
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from conversation_log import ConversationLogger, build_chat_record
+
+
+class TestConversationLog(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def test_records_are_written_and_rotated(self):
+        logger = ConversationLogger(self.log_dir, flush_interval=0.05, max_bytes=500, compress=True)
+        for i in range(20):
+            logger.log(build_chat_record(f"message {i}", ["reply"], "neutral"))
+        logger.close()
+
+        stats = logger.get_stats()
+        self.assertEqual(stats["written"], 20)
+        self.assertEqual(stats["dropped"], 0)
+        self.assertGreater(stats["rotations"], 0)
+
+        records = []
+        for name in sorted(os.listdir(self.log_dir)):
+            path = os.path.join(self.log_dir, name)
+            opener = gzip.open if name.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                records.extend(json.loads(line) for line in f)
+        self.assertEqual(sorted(r["input_text"] for r in records), sorted(f"message {i}" for i in range(20)))
+        self.assertEqual(records[0]["output_text"], "[neutral]: reply")
+
+    def test_files_are_per_process(self):
+        logger = ConversationLogger(self.log_dir, flush_interval=0.05, max_bytes=200, compress=False)
+        for i in range(10):
+            logger.log(build_chat_record(f"message {i}", ["reply"], "neutral"))
+        logger.close()
+        self.assertTrue(os.listdir(self.log_dir))
+        for name in os.listdir(self.log_dir):
+            self.assertTrue(name.startswith(f"conversations-{os.getpid()}"), name)
+
+    def test_overload_drops_instead_of_blocking(self):
+        logger = ConversationLogger(self.log_dir, max_queue=1, flush_interval=0.05)
+        logger._stop.set()
+        logger._thread.join()
+        self.assertTrue(logger.log({"n": 1}))
+        self.assertFalse(logger.log({"n": 2}))
+        self.assertEqual(logger.get_stats()["dropped"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import time
+import unittest
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import core_logic
+from deadline import Deadline, ensure_deadline
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_unbounded_deadline(self):
+        deadline = ensure_deadline(None)
+        self.assertIsNone(deadline.timeout())
+        self.assertEqual(deadline.request_options(), {})
+        self.assertTrue(deadline.allows("brand_breakdown"))
+        self.assertEqual(deadline.degraded_stages, [])
+
+    def test_short_budget_skips_optional_stages(self):
+        deadline = Deadline(0.05)
+        time.sleep(0.06)
+        self.assertTrue(deadline.expired())
+        self.assertFalse(deadline.allows("fuzzy_search"))
+        self.assertFalse(deadline.allows("fuzzy_search"))
+        self.assertEqual(deadline.degraded_stages, ["fuzzy_search"])
+        self.assertEqual(deadline.request_options(minimum=2), {"timeout": 2})
+
+    def test_expired_deadline_degrades_context(self):
+        deadline = Deadline(0)
+        context, metadata = core_logic.build_database_context("hello", ["Drug001", "Drug002"], deadline)
+        self.assertIn("extraction", metadata["degraded_stages"])
+        self.assertIn("db_lookup", metadata["degraded_stages"])
+        self.assertEqual(sorted(metadata["unchecked_drugs"]), ["Drug001", "Drug002"])
+        self.assertIn("Could not finish checking in time", context)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import unittest
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from description_store import DescriptionStore
+from cache_backends import SQLiteBackend
+from core_logic import QueryCache
+
+
+def edge(a, b, template):
+    return {"drug_a": a, "drug_b": b, "description": template.format(a=a, b=b)}
+
+
+class TestDescriptionStore(unittest.TestCase):
+
+    def test_round_trip_and_template_sharing(self):
+        store = DescriptionStore()
+        interactions = [
+            edge("Warfarin", "Aspirin", "{a} may increase the anticoagulant activities of {b}."),
+            edge("Heparin", "Ibuprofen", "{a} may increase the anticoagulant activities of {b}."),
+            edge("Sertraline", "Tramadol", "The risk of serotonin syndrome rises when {b} is combined with {a} (see {b} label)."),
+            {"drug_a": "A", "drug_b": "B", "description": "x", "severity": "major"},
+        ]
+        refs = store.intern_many(interactions)
+        self.assertEqual(store.render_many(refs), interactions)
+        self.assertEqual(store.get_stats()["templates"], 2)
+        self.assertIsInstance(refs[-1], dict)
+
+        # The same edge interned again reuses its id
+        self.assertEqual(store.intern(dict(interactions[0])), refs[0])
+
+    def test_mixed_case_mentions_are_preserved(self):
+        store = DescriptionStore()
+        interaction = edge("Warfarin", "Aspirin", "warfarin and ASPIRIN: avoid {b}.")
+        self.assertEqual(store.render(store.intern(interaction)), interaction)
+
+    def test_query_cache_stores_edge_ids_in_memory_only(self):
+        interactions = [edge("Warfarin", "Aspirin", "{a} may increase the anticoagulant activities of {b}.")]
+        cache = QueryCache(store=DescriptionStore())
+        cache.set_interactions("aspirin|warfarin", interactions)
+        self.assertEqual(cache.backend.get("interactions", "aspirin|warfarin"), (0,))
+        self.assertEqual(cache.get_interactions("aspirin|warfarin"), interactions)
+
+        # Snapshots carry text, and import re-interns it
+        state = cache.export_state()
+        self.assertEqual(state["interactions_cache"]["aspirin|warfarin"], interactions)
+        restored = QueryCache(store=DescriptionStore())
+        restored.import_state(state)
+        self.assertEqual(restored.get_interactions("aspirin|warfarin"), interactions)
+
+        shared = QueryCache(SQLiteBackend(":memory:"))
+        self.assertIsNone(shared.store)
+
+    def test_graph_change_resets_the_store(self):
+        store = DescriptionStore()
+        cache = QueryCache(store=store)
+        old = edge("Warfarin", "Aspirin", "{a} may increase the anticoagulant activities of {b}.")
+        stale_refs = store.intern_many([old])
+        cache.set_interactions("aspirin|warfarin", [old])
+
+        cache.invalidate_namespaces(cache.GRAPH_NAMESPACES)
+        self.assertEqual(store.get_stats(), {"edges": 0, "templates": 0, "names": 0})
+        self.assertIsNone(cache.get_interactions("aspirin|warfarin"))
+
+        # Ids interned before the reset never render against the new tables
+        new = edge("Heparin", "Ibuprofen", "{a} raises the bleeding risk of {b}.")
+        store.intern_many([new])
+        self.assertIsNone(store.render_many(stale_refs))
+        cache.backend.set("interactions", "aspirin|warfarin", stale_refs)
+        self.assertIsNone(cache.get_interactions("aspirin|warfarin"))
+        self.assertIsNone(cache.backend.get("interactions", "aspirin|warfarin"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from drug_names import canonical_key, normalize_text, brand_ingredients, canonicalize_drug_list
+
+
+class TestDrugNames(unittest.TestCase):
+
+    def test_synonyms_and_brands_share_one_key(self):
+        self.assertEqual(canonical_key("Acetaminophen"), "acetaminophen")
+        self.assertEqual(canonical_key("paracetamol "), "acetaminophen")
+        self.assertEqual(canonical_key("Tylenol"), "acetaminophen")
+
+    def test_text_normalization(self):
+        self.assertEqual(normalize_text("  Ibuprofen   400mg tablets "), "ibuprofen")
+        self.assertEqual(normalize_text("Sertraline HCl 50 mg"), "sertraline")
+        self.assertEqual(normalize_text("Naproxen Sodium"), "naproxen")
+        # Names made only of salt words are left alone
+        self.assertEqual(normalize_text("Magnesium Sulfate"), "magnesium sulfate")
+        # ...and so are cation stems that are not a drug by themselves
+        self.assertEqual(normalize_text("Ferrous Sulfate 325mg tablets"), "ferrous sulfate")
+        self.assertEqual(normalize_text("Zinc Sulfate"), "zinc sulfate")
+
+    def test_brand_ingredients(self):
+        self.assertEqual(brand_ingredients("Panadol Extra"), ["acetaminophen", "caffeine"])
+        self.assertIsNone(brand_ingredients("Unknown Brand"))
+
+    def test_canonicalize_drug_list_dedupes(self):
+        result = canonicalize_drug_list(["Paracetamol", "Tylenol 500mg", "Aspirin", ""])
+        self.assertEqual(result, [("acetaminophen", "Paracetamol"), ("aspirin", "Aspirin")])
+
+
+if __name__ == '__main__':
+    unittest.main()
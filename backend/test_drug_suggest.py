@@ -0,0 +1,59 @@
+import time
+import unittest
+from drug_suggest import SuggestIndex, DrugSuggester
+
+
+class TestDrugSuggest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SuggestIndex([
+            ("Paroxetine", "drug", None),
+            ("Paracetamol", "alias", "acetaminophen"),
+            ("Acetaminophen", "drug", None),
+            ("Naproxen Sodium", "drug", None),
+            ("Naproxen", "drug", None),
+            ("Sodium Bicarbonate", "drug", None),
+        ])
+
+    def test_prefix_and_ranking(self):
+        names = [s["name"] for s in self.index.suggest("par")]
+        self.assertEqual(names, ["Paroxetine", "Paracetamol"])
+        self.assertEqual(self.index.suggest("PARACETAMOL")[0], {"name": "Paracetamol", "type": "alias", "canonical": "acetaminophen"})
+        self.assertEqual([s["name"] for s in self.index.suggest("naproxen")], ["Naproxen", "Naproxen Sodium"])
+
+    def test_later_word_matches_rank_after_name_prefix(self):
+        names = [s["name"] for s in self.index.suggest("sod")]
+        self.assertEqual(names, ["Sodium Bicarbonate", "Naproxen Sodium"])
+
+    def test_empty_and_limit(self):
+        self.assertEqual(self.index.suggest("  "), [])
+        self.assertEqual(len(self.index.suggest("n", limit=1)), 1)
+
+    def test_lookup_is_fast_on_large_index(self):
+        index = SuggestIndex([(f"Drug{i:06d}", "drug", None) for i in range(50000)])
+        start = time.perf_counter()
+        for _ in range(100):
+            index.suggest("drug01", limit=10)
+        self.assertLess((time.perf_counter() - start) / 100, 0.005)
+
+    def test_suggester_includes_aliases(self):
+        suggester = DrugSuggester(lambda: (["Acetaminophen"], True))
+        suggester.build()
+        types = {s["name"]: s["type"] for s in suggester.suggest("tylen")}
+        self.assertEqual(types.get("Tylenol"), "alias")
+
+    def test_fallback_index_is_rebuilt_later(self):
+        responses = [(["Drug001"], False), (["Warfarin"], True)]
+        suggester = DrugSuggester(lambda: responses.pop(0), retry_seconds=0)
+        suggester.build()
+        self.assertTrue(suggester.from_fallback)
+        suggester.suggest("war")  # triggers a background rebuild
+        for _ in range(100):
+            if not suggester.from_fallback:
+                break
+            time.sleep(0.01)
+        self.assertEqual(suggester.suggest("war")[0]["name"], "Warfarin")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import unittest
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import database
+import core_logic
+from circuit_breaker import CircuitBreaker
+from core_logic import QueryCache, check_interactions_for_drugs, search_drugs_in_database, evaluate_profile_interactions
+from medication_profile import MedicationProfile
+from deadline import Deadline
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        if self.driver.fail:
+            raise self.driver.error
+        return FakeResult(self.driver.records)
+
+
+class FakeResult(list):
+    def single(self):
+        return self[0] if self else None
+
+
+class FakeDriver:
+    def __init__(self):
+        self.fail = True
+        self.error = ConnectionError("connection reset")
+        self.records = []
+
+    def session(self):
+        return FakeSession(self)
+
+
+class TestFallbackCaching(unittest.TestCase):
+    """A single failed query (breaker still closed) must not be cached as the real answer."""
+
+    def setUp(self):
+        self.saved = (database.uri, database.user, database.password, database.driver,
+                      database.neo4j_breaker, core_logic.query_cache)
+        database.uri, database.user, database.password = "bolt://fake", "neo4j", "secret"
+        database.driver = FakeDriver()
+        database.neo4j_breaker = CircuitBreaker("test", failure_threshold=3)
+        core_logic.query_cache = QueryCache()
+
+    def tearDown(self):
+        (database.uri, database.user, database.password, database.driver,
+         database.neo4j_breaker, core_logic.query_cache) = self.saved
+
+    def test_failed_interaction_query_is_not_cached(self):
+        drugs = [{"name": "Drug001"}, {"name": "Drug002"}]
+        deadline = Deadline(None)
+        interactions = check_interactions_for_drugs(drugs, deadline)
+        self.assertEqual(interactions[0]["description"], "Interaction description 1")  # mock fallback
+        self.assertEqual(database.neo4j_breaker.state, "closed")
+        self.assertIsNone(core_logic.query_cache.get_interactions("drug001|drug002"))
+        self.assertIn("db_fallback", deadline.degraded_stages)
+
+        database.driver.fail = False
+        database.driver.records = [{"Drug1": "Drug001", "Drug2": "Drug002", "Description": "live"}]
+        deadline = Deadline(None)
+        self.assertEqual(check_interactions_for_drugs(drugs, deadline)[0]["description"], "live")
+        self.assertEqual(core_logic.query_cache.get_interactions("drug001|drug002")[0]["description"], "live")
+        self.assertEqual(deadline.degraded_stages, [])
+
+    def test_failed_drug_lookup_is_not_cached(self):
+        deadline = Deadline(None)
+        result = search_drugs_in_database(["Drug003"], deadline)
+        self.assertEqual(result["found"][0]["name"], "Drug003")
+        self.assertIsNone(core_logic.query_cache.get_drug("Drug003"))
+        self.assertIn("db_fallback", deadline.degraded_stages)
+
+    def test_failed_profile_query_leaves_drugs_pending(self):
+        profile = MedicationProfile()
+        profile.add(["Drug001", "Drug002"])
+        deadline = Deadline(None)
+        evaluate_profile_interactions(profile, deadline)
+        self.assertEqual(profile.to_dict()["pending"], ["Drug001", "Drug002"])
+        self.assertIn("db_fallback", deadline.degraded_stages)
+
+        database.driver.fail = False
+        database.driver.records = [{"Drug1": "Drug001", "Drug2": "Drug002", "Description": "live"}]
+        self.assertEqual(evaluate_profile_interactions(profile)[0]["description"], "live")
+        self.assertEqual(profile.to_dict()["pending"], [])
+
+    def test_deadline_timeouts_do_not_count_against_the_breaker(self):
+        database.driver.error = TimeoutError("timed out")
+        for _ in range(5):
+            database.get_drug_by_name("Drug001", timeout=0.3)
+        stats = database.neo4j_breaker.get_stats()
+        self.assertEqual((stats["state"], stats["failures"], stats["ignored"]), ("closed", 0, 5))
+
+        # A timeout with a healthy budget is a real failure
+        database.get_drug_by_name("Drug001", timeout=10)
+        self.assertEqual(database.neo4j_breaker.get_stats()["failures"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dataset"))
+
+from finetuning_yunita import normalize_sample, build_dataset, shard_for, CONVERSATION_SAMPLES
+
+
+class TestFinetuningDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _write_log(self, records, name="log.jsonl"):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write((record if isinstance(record, str) else json.dumps(record)) + "\n")
+        return path
+
+    def _read_shards(self, output_dir):
+        samples = {}
+        for name in sorted(os.listdir(output_dir)):
+            if name.endswith(".jsonl"):
+                with open(os.path.join(output_dir, name), encoding="utf-8") as f:
+                    samples[name] = [json.loads(line) for line in f]
+        return samples
+
+    def test_normalize_sample_maps_emotion_aliases(self):
+        sample, digest = normalize_sample({"input_text": "Halo", "output_text": "[Senang]: Hai juga!"})
+        self.assertEqual(sample["output_text"], "[happy]: Hai juga!")
+        self.assertEqual(len(digest), 20)
+        self.assertEqual(normalize_sample({"input_text": "Halo", "output_text": "tanpa tag"}), (None, "tanpa_tag"))
+        self.assertEqual(normalize_sample({"input_text": "Halo", "output_text": "[marah]: x"}), (None, "tag_tidak_dikenal"))
+        doubled = {"input_text": "Halo", "output_text": "[concerned]: [concerned] I'm having trouble connecting..."}
+        self.assertEqual(normalize_sample(doubled), (None, "tag_ganda"))
+
+    def test_build_dataset_dedupes_and_rejects(self):
+        good = {"input_text": "Can I take aspirin?", "output_text": "[concerned]: Check with your doctor."}
+        log = self._write_log([good, good, "{not json", {"input_text": "x", "output_text": ""}])
+        output_dir = os.path.join(self.tmp, "out")
+        stats = build_dataset([log], output_dir, num_shards=2, workers=1)
+
+        self.assertEqual(stats["dibaca"], len(CONVERSATION_SAMPLES) + 4)
+        self.assertEqual(stats["duplikat"], 1)
+        self.assertEqual(stats["ditolak"], {"json_rusak": 1, "kosong": 1})
+        written = [s for shard in self._read_shards(output_dir).values() for s in shard]
+        self.assertEqual(len(written), stats["ditulis"])
+        self.assertIn(good, written)
+
+    def test_sharding_is_independent_of_worker_count(self):
+        records = [{"input_text": f"question {i}", "output_text": f"[neutral]: answer {i}"} for i in range(300)]
+        log = self._write_log(records)
+        single = os.path.join(self.tmp, "single")
+        parallel = os.path.join(self.tmp, "parallel")
+        build_dataset([log], single, num_shards=4, workers=1)
+        build_dataset([log], parallel, num_shards=4, workers=2)
+        self.assertEqual(self._read_shards(single), self._read_shards(parallel))
+
+    def test_shard_for_is_deterministic(self):
+        digest = bytes(range(20))
+        self.assertEqual(shard_for(digest, 8, 5), shard_for(digest, 8, 5))
+        self.assertEqual(shard_for(digest, 8, 0)[0], "train")
+        self.assertEqual(shard_for(digest, 8, 100)[0], "eval")
+
+
+if __name__ == '__main__':
+    unittest.main()
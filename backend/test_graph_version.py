@@ -0,0 +1,50 @@
+import os
+import unittest
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from core_logic import QueryCache
+from graph_version import GraphVersionWatcher
+
+
+class TestGraphVersion(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = QueryCache()
+        self.cache.set_drug("Aspirin", {"id": 1, "name": "Aspirin"})
+        self.cache.set_interactions("aspirin|warfarin", [{"drug_a": "Aspirin", "drug_b": "Warfarin", "description": "x"}])
+        self.cache.set_ingredients("Panadol Extra", ["Acetaminophen", "Caffeine"])
+        self.version = "v1"
+        self.watcher = GraphVersionWatcher(self.cache, lambda timeout=None: self.version)
+
+    def test_version_change_clears_graph_namespaces_only(self):
+        self.assertTrue(self.watcher.check())
+        self.assertIsNone(self.cache.get_drug("Aspirin"))
+        self.assertIsNone(self.cache.get_interactions("aspirin|warfarin"))
+        self.assertEqual(self.cache.get_ingredients("Panadol Extra"), ["Acetaminophen", "Caffeine"])
+
+        self.cache.set_drug("Aspirin", {"id": 1, "name": "Aspirin"})
+        self.assertFalse(self.watcher.check())
+        self.assertIsNotNone(self.cache.get_drug("Aspirin"))
+
+        self.version = "v2"
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.watcher.invalidations, 2)
+
+    def test_unreachable_graph_keeps_cache(self):
+        self.version = None
+        self.assertFalse(self.watcher.check())
+        self.assertIsNotNone(self.cache.get_drug("Aspirin"))
+
+    def test_invalidate_drug_and_stats(self):
+        self.cache.set_interactions("ibuprofen|warfarin", [])
+        removed = self.cache.invalidate_drug("aspirin")
+        self.assertEqual(removed, 2)
+        self.assertIsNotNone(self.cache.get_interactions("ibuprofen|warfarin"))
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["interactions"]["size"], 1)
+        self.assertEqual(stats["interactions"]["hit_rate"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from medication_profile import MedicationProfile, SessionProfiles
+
+KNOWN = {("aspirin", "warfarin"), ("ibuprofen", "warfarin")}
+
+
+class FakeGraph:
+    """Records which pairs were asked for and answers from KNOWN."""
+
+    def __init__(self, reliable=True):
+        self.reliable = reliable
+        self.calls = []
+
+    def __call__(self, new_names, all_names):
+        new = {n.lower() for n in new_names}
+        everything = {n.lower() for n in all_names}
+        self.calls.append((sorted(new), sorted(everything)))
+        found = [{"drug_a": a, "drug_b": b, "description": f"{a}+{b}"}
+                 for a, b in KNOWN if (a in new and b in everything) or (b in new and a in everything)]
+        return found, self.reliable
+
+
+class TestMedicationProfile(unittest.TestCase):
+
+    def test_adding_a_drug_only_checks_its_new_pairs(self):
+        profile = MedicationProfile()
+        graph = FakeGraph()
+        profile.add(["Warfarin", "Aspirin"])
+        self.assertEqual(len(profile.evaluate(graph)), 1)
+        self.assertEqual(profile.pairs_checked, 1)
+
+        profile.add(["Ibuprofen"])
+        self.assertEqual(len(profile.evaluate(graph)), 2)
+        self.assertEqual(graph.calls[-1][0], ["ibuprofen"])
+        self.assertEqual(profile.pairs_checked, 3)
+
+        # Nothing new: no query at all
+        profile.evaluate(graph)
+        self.assertEqual(len(graph.calls), 2)
+
+    def test_removing_a_drug_drops_its_pairs(self):
+        profile = MedicationProfile()
+        graph = FakeGraph()
+        profile.add(["Warfarin", "Aspirin", "Ibuprofen"])
+        profile.evaluate(graph)
+        profile.sync(["Aspirin", "Ibuprofen"])
+        self.assertEqual(profile.evaluate(graph), [])
+        self.assertEqual(len(graph.calls), 1)
+
+        profile.add(["warfarin"])
+        self.assertEqual(len(profile.evaluate(graph)), 2)
+        self.assertEqual(graph.calls[-1][0], ["warfarin"])
+
+    def test_unreliable_results_are_rechecked(self):
+        profile = MedicationProfile()
+        profile.add(["Warfarin", "Aspirin"])
+        profile.evaluate(FakeGraph(reliable=False))
+        self.assertEqual(profile.to_dict()["pending"], ["Warfarin", "Aspirin"])
+        graph = FakeGraph()
+        profile.evaluate(graph)
+        self.assertEqual(len(graph.calls), 1)
+        self.assertEqual(profile.to_dict()["pending"], [])
+
+    def test_session_store_is_bounded(self):
+        sessions = SessionProfiles(max_sessions=2)
+        first = sessions.get("a")
+        self.assertIs(sessions.get("a"), first)
+        sessions.get("b")
+        sessions.get("c")
+        self.assertEqual(len(sessions), 2)
+        self.assertIsNot(sessions.get("a"), first)
+        self.assertIsNone(sessions.get(None))
+        for bad_id in (["a"], {"a": 1}, 42, "   "):
+            self.assertIsNone(sessions.get(bad_id))
+        sessions.clear()
+        self.assertEqual(len(sessions), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
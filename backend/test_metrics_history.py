@@ -0,0 +1,57 @@
+import unittest
+from metrics import MetricsHistory
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestMetricsHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.history = MetricsHistory({"1s": (1, 10), "1m": (60, 6)}, clock=self.clock)
+
+    def test_records_requests_latency_and_cache(self):
+        for latency in (0.2, 0.4, 0.4, 4.0):
+            self.history.record_request(latency, llm_calls=2, db_calls=1)
+        self.history.record_cache(3, 1)
+
+        result = self.history.history("1s", points=10)
+        series = result["series"]
+        self.assertEqual(result["step_seconds"], 1)
+        self.assertEqual(series["requests"][-1], 4)
+        self.assertEqual(series["llm_calls"][-1], 8)
+        self.assertEqual(series["db_calls"][-1], 4)
+        self.assertEqual(series["latency_p50"][-1], 0.5)
+        self.assertEqual(series["latency_p99"][-1], 5.0)
+        self.assertAlmostEqual(series["cache_hit_rate"][-1], 0.75)
+        self.assertEqual(series["requests"][:-1], [0] * 9)
+        self.assertIsNone(series["latency_p50"][0])
+
+    def test_ring_wraps_and_drops_old_periods(self):
+        self.history.record_request(1.0)
+        self.clock.now += 15  # older than the 10-slot 1s ring
+        self.history.record_request(1.0)
+        series = self.history.history("1s", points=10)["series"]
+        self.assertEqual(sum(series["requests"]), 1)
+        # The 1m ring still holds both
+        self.assertEqual(sum(self.history.history("1m", points=6)["series"]["requests"]), 2)
+
+    def test_downsampling_merges_slots(self):
+        for _ in range(5):
+            self.history.record_request(0.1)
+            self.clock.now += 1
+        result = self.history.history("1s", points=5)
+        self.assertEqual(result["points"], 5)
+        self.assertEqual(result["step_seconds"], 2)
+        self.assertEqual(sum(result["series"]["requests"]), 5)
+        self.assertEqual(len(result["series"]["timestamps"]), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
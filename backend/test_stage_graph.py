@@ -0,0 +1,68 @@
+import os
+import time
+import unittest
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import core_logic
+from stage_graph import StageGraph
+
+
+class TestStageGraph(unittest.TestCase):
+
+    def test_dependencies_receive_results(self):
+        graph = StageGraph()
+        graph.add("a", lambda: 1)
+        graph.add("b", lambda: 2)
+        graph.add("c", lambda a, b: a + b, deps=["a", "b"])
+        self.assertEqual(graph.run(), {"a": 1, "b": 2, "c": 3})
+        self.assertEqual(set(graph.timings), {"a", "b", "c"})
+
+    def test_independent_stages_overlap(self):
+        graph = StageGraph()
+        graph.add("slow1", lambda: time.sleep(0.2))
+        graph.add("slow2", lambda: time.sleep(0.2))
+        start = time.perf_counter()
+        graph.run()
+        self.assertLess(time.perf_counter() - start, 0.35)
+
+    def test_errors_propagate(self):
+        graph = StageGraph()
+        graph.add("boom", lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            graph.run()
+        with self.assertRaises(ValueError):
+            StageGraph().add("x", lambda y: y, deps=["y"])
+
+    def test_context_lookup_overlaps_extraction(self):
+        original_extract = core_logic.extract_drugs_from_message
+        original_search = core_logic.search_drugs_in_database
+
+        def slow_extract(message, deadline=None):
+            time.sleep(0.2)
+            return {"drugs_mentioned": ["Drug003"], "intent": "asking_about_interactions", "query_context": ""}
+
+        def slow_client_search(drug_names, deadline=None):
+            # Only the drug_list lookup is slow
+            if "Drug001" in drug_names:
+                time.sleep(0.2)
+            return original_search(drug_names, deadline)
+
+        core_logic.extract_drugs_from_message = slow_extract
+        core_logic.search_drugs_in_database = slow_client_search
+        try:
+            start = time.perf_counter()
+            context, metadata = core_logic.build_database_context("Drug003?", ["Drug001", "Drug002"])
+            elapsed = time.perf_counter() - start
+        finally:
+            core_logic.extract_drugs_from_message = original_extract
+            core_logic.search_drugs_in_database = original_search
+
+        self.assertEqual(sorted(metadata["found_drugs"]), ["Drug001", "Drug002", "Drug003"])
+        self.assertIn("Interaction description 1", context)
+        # max(extraction, lookup), not their sum
+        self.assertLess(elapsed, 0.35)
+
+
+if __name__ == '__main__':
+    unittest.main()
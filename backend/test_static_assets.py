@@ -0,0 +1,88 @@
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+from flask import Flask, request
+from build_assets import build, Image
+from static_assets import StaticAssets, _accepts
+
+
+class TestStaticAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "images"))
+        with open(os.path.join(self.root, "app.js"), "w") as f:
+            f.write("console.log('karin');\n" * 200)
+        if Image is not None:
+            Image.new("RGB", (1200, 900), (200, 120, 90)).save(os.path.join(self.root, "images", "happy.png"))
+        build(self.root, max_size=400)
+
+        self.assets = StaticAssets(self.root)
+        app = Flask(__name__)
+
+        @app.route('/<path:path>')
+        def serve(path):
+            return self.assets.response(path, request) or ("missing", 404)
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_accept_parsing(self):
+        self.assertTrue(_accepts("gzip, deflate, br", "br"))
+        self.assertFalse(_accepts("gzip;q=0, br", "gzip"))
+        self.assertFalse(_accepts("image/webp", "image/avif"))
+
+    def test_precompressed_text_and_revalidation(self):
+        response = self.client.get("/app.js", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        self.assertIn("must-revalidate", response.headers["Cache-Control"])
+        self.assertIn(b"karin", gzip.decompress(response.data))
+        etag = response.headers["ETag"]
+
+        identity = self.client.get("/app.js", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", identity.headers)
+        self.assertNotEqual(identity.headers["ETag"], etag)
+
+        cached = self.client.get("/app.js", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_versioned_url_is_immutable(self):
+        version = self.assets.versions()["app.js"]
+        response = self.client.get(f"/app.js?v={version}")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        stale = self.client.get("/app.js?v=old")
+        self.assertNotIn("immutable", stale.headers["Cache-Control"])
+
+    def test_versions_without_a_build(self):
+        shutil.rmtree(os.path.join(self.root, "build"))
+        unbuilt = StaticAssets(self.root)
+        versions = unbuilt.versions()
+        self.assertIn("app.js", versions)
+        self.assertFalse(any(path.startswith("build/") for path in versions))
+        self.assertEqual(versions["app.js"], unbuilt.version("app.js"))
+
+        self.assets = unbuilt
+        response = self.client.get(f"/app.js?v={versions['app.js']}")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+
+    def test_path_traversal_and_build_dir_are_not_served(self):
+        self.assertEqual(self.client.get("/../secret.txt").status_code, 404)
+        self.assertEqual(self.client.get("/build/manifest.json").status_code, 404)
+
+    @unittest.skipIf(Image is None, "Pillow not installed")
+    def test_image_negotiation(self):
+        webp = self.client.get("/images/happy.png", headers={"Accept": "image/webp,*/*"})
+        self.assertEqual(webp.mimetype, "image/webp")
+        self.assertEqual(webp.headers["Vary"], "Accept")
+        original = self.client.get("/images/happy.png", headers={"Accept": "*/*"})
+        self.assertEqual(original.mimetype, "image/png")
+        self.assertLess(len(webp.data), len(original.data))
+
+
+if __name__ == '__main__':
+    unittest.main()
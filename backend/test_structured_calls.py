@@ -0,0 +1,79 @@
+import os
+import unittest
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import core_logic
+from core_logic import parse_extraction, parse_ingredients, normalize_message
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeModel:
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        return _FakeResponse(self.text)
+
+
+class TestStructuredCalls(unittest.TestCase):
+
+    def setUp(self):
+        self.original_model = core_logic.structured_model
+        core_logic.query_cache.clear()
+
+    def tearDown(self):
+        core_logic.structured_model = self.original_model
+        core_logic.query_cache.clear()
+
+    def test_parse_extraction(self):
+        parsed = parse_extraction('{"drugs_mentioned": ["Aspirin", " ", 3], "intent": "checking_safety"}')
+        self.assertEqual(parsed, {"drugs_mentioned": ["Aspirin"], "intent": "checking_safety", "query_context": ""})
+        # Non-conforming replies still parse; unknown intents fall back
+        parsed = parse_extraction('Sure! {"drugs_mentioned": [], "intent": "other"}')
+        self.assertEqual(parsed["intent"], "general_question")
+        self.assertIsNone(parse_extraction("no json here"))
+        self.assertIsNone(parse_extraction('{"intent": "general_question"}'))
+
+    def test_parse_ingredients(self):
+        self.assertEqual(parse_ingredients('{"ingredients": ["Acetaminophen", "Caffeine"]}'), ["Acetaminophen", "Caffeine"])
+        self.assertIsNone(parse_ingredients("['Acetaminophen']"))
+
+    def test_extraction_cached_by_normalized_message(self):
+        fake = _FakeModel('{"drugs_mentioned": ["Aspirin"], "intent": "checking_safety", "query_context": ""}')
+        core_logic.structured_model = fake
+        first = core_logic.extract_drugs_from_message("Is Aspirin safe?")
+        second = core_logic.extract_drugs_from_message("  is aspirin   SAFE ")
+        self.assertEqual(first, second)
+        self.assertEqual(fake.calls, 1)
+        self.assertEqual(normalize_message("  is aspirin   SAFE?"), "is aspirin safe")
+
+    def test_extraction_cache_is_bounded_hashed_and_not_snapshotted(self):
+        cache = core_logic.QueryCache()
+        cache.EXTRACTION_CACHE_SIZE = 2
+        for message in ("I take aspirin for my heart", "b", "c"):
+            cache.set_extraction(message, {"drugs_mentioned": [], "intent": "general_question", "query_context": ""})
+        self.assertEqual(len(cache.extractions), 2)
+        self.assertIsNone(cache.get_extraction("I take aspirin for my heart"))
+        self.assertNotIn("aspirin", " ".join(cache.extractions))
+        self.assertNotIn("extraction_cache", cache.export_state())
+
+        cache.EXTRACTION_CACHE_TTL_SECONDS = 0
+        self.assertIsNone(cache.get_extraction("b"))
+
+    def test_failed_extraction_is_not_cached(self):
+        fake = _FakeModel("not json")
+        core_logic.structured_model = fake
+        core_logic.extract_drugs_from_message("hello")
+        core_logic.extract_drugs_from_message("hello")
+        self.assertEqual(fake.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
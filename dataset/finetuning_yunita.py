@@ -1,7 +1,14 @@
 # File: scripts/buat_dataset.py
 
-import json
 import os
+import re
+import gzip
+import json
+import sqlite3
+import hashlib
+import argparse
+from itertools import islice
+from multiprocessing import Pool
 
 # --- PUSAT DATA ANDA ---
 # Tambahkan semua contoh percakapan Anda di dalam list ini.
@@ -36,6 +43,160 @@ CONVERSATION_SAMPLES = [
     # ... (TAMBAHKAN LEBIH BANYAK CONTOH DI SINI) ...
 ]
 
+# --- NORMALISASI TAG EMOSI ---
+# Semua tag dipetakan ke tag yang dipakai backend (lihat get_karin_response di core_logic.py).
+VALID_EMOTIONS = {"neutral", "happy", "blushing", "concerned", "curious", "annoyed"}
+EMOTION_ALIASES = {
+    "netral": "neutral", "senang": "happy", "malu-malu": "blushing", "malu": "blushing",
+    "khawatir": "concerned", "penasaran": "curious", "kesal": "annoyed",
+    "jengkel": "annoyed", "angkuh": "annoyed",
+}
+TAG_PATTERN = re.compile(r'^\s*\[([^\]]+)\]\s*:?\s*')
+
+# Ukuran potongan baris yang dikirim ke setiap worker
+CHUNK_SIZE = 2000
+
+
+def normalize_sample(record):
+    """
+    Memvalidasi satu sampel dan menormalkan tag emosinya menjadi "[tag]: teks".
+    Mengembalikan (sampel, digest) atau (None, alasan_ditolak).
+    """
+    if not isinstance(record, dict):
+        return None, "bukan_objek"
+    input_text = (record.get("input_text") or "").strip()
+    output_text = (record.get("output_text") or "").strip()
+    if not input_text or not output_text:
+        return None, "kosong"
+
+    match = TAG_PATTERN.match(output_text)
+    if not match:
+        return None, "tanpa_tag"
+    tag = match.group(1).strip().lower()
+    emotion = EMOTION_ALIASES.get(tag, tag)
+    if emotion not in VALID_EMOTIONS:
+        return None, "tag_tidak_dikenal"
+
+    body = output_text[match.end():].strip()
+    if not body:
+        return None, "kosong"
+    # "[concerned]: [concerned] ..." = balasan error/mentah yang tag-nya tidak dibersihkan
+    inner = TAG_PATTERN.match(body)
+    if inner and EMOTION_ALIASES.get(inner.group(1).strip().lower(), inner.group(1).strip().lower()) in VALID_EMOTIONS:
+        return None, "tag_ganda"
+
+    sample = {"input_text": input_text, "output_text": f"[{emotion}]: {body}"}
+    digest = hashlib.sha1(f"{input_text}\x00{sample['output_text']}".encode("utf-8")).digest()
+    return sample, digest
+
+
+def _process_lines(lines):
+    """Dijalankan di worker: parse JSON + validasi + hash untuk satu potongan baris."""
+    results = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            results.append((None, "json_rusak"))
+            continue
+        results.append(normalize_sample(record))
+    return results
+
+
+def iter_source_lines(paths):
+    """Membaca file log JSONL (boleh .gz) baris demi baris tanpa memuat semuanya ke memori."""
+    for item in CONVERSATION_SAMPLES:
+        yield json.dumps(item, ensure_ascii=False)
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield line
+
+
+def iter_chunks(lines, size=CHUNK_SIZE):
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class DigestIndex:
+    """Indeks hash konten di disk (SQLite, 8 byte per entri) untuk dedupe jutaan sampel."""
+
+    def __init__(self, path, reset=True):
+        if reset and os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+
+    def add(self, digest):
+        """Mengembalikan True jika digest baru (belum pernah terlihat)."""
+        cursor = self.conn.execute("INSERT OR IGNORE INTO seen (digest) VALUES (?)", (digest[:8],))
+        return cursor.rowcount == 1
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def shard_for(digest, num_shards, eval_percent):
+    """Pembagian deterministik berdasarkan hash: hasil sama berapapun urutan atau jumlah worker."""
+    value = int.from_bytes(digest[:8], "big")
+    split = "eval" if value % 100 < eval_percent else "train"
+    return split, (value // 100) % num_shards
+
+
+def build_dataset(log_paths, output_dir, num_shards=8, eval_percent=5, workers=None, append=False):
+    """
+    Pipeline streaming: baca log -> validasi & normalisasi (paralel) -> dedupe -> tulis shard train/eval.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    index = DigestIndex(os.path.join(output_dir, "dedupe_index.sqlite"), reset=not append)
+    mode = "a" if append else "w"
+    shard_files = {}
+    stats = {"dibaca": 0, "ditulis": 0, "duplikat": 0, "ditolak": {}}
+
+    def shard_file(split, shard):
+        key = (split, shard)
+        if key not in shard_files:
+            name = f"{split}-{shard:05d}-of-{num_shards:05d}.jsonl"
+            shard_files[key] = open(os.path.join(output_dir, name), mode, encoding="utf-8")
+        return shard_files[key]
+
+    chunks = iter_chunks(iter_source_lines(log_paths))
+    pool = Pool(workers) if workers != 1 else None
+    try:
+        # imap menjaga urutan potongan, sehingga output tetap deterministik
+        results = pool.imap(_process_lines, chunks) if pool else map(_process_lines, chunks)
+        for chunk_results in results:
+            for sample, digest_or_reason in chunk_results:
+                stats["dibaca"] += 1
+                if sample is None:
+                    stats["ditolak"][digest_or_reason] = stats["ditolak"].get(digest_or_reason, 0) + 1
+                    continue
+                if not index.add(digest_or_reason):
+                    stats["duplikat"] += 1
+                    continue
+                split, shard = shard_for(digest_or_reason, num_shards, eval_percent)
+                shard_file(split, shard).write(json.dumps(sample, ensure_ascii=False) + '\n')
+                stats["ditulis"] += 1
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        for f in shard_files.values():
+            f.close()
+        index.close()
+
+    return stats
+
+
 def create_dataset_file():
     """
     Fungsi ini akan mengambil semua data dari CONVERSATION_SAMPLES
@@ -51,19 +212,41 @@ def create_dataset_file():
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
     try:
+        total = 0
         with open(output_path, 'w', encoding='utf-8') as f:
-            for item in CONVERSATION_SAMPLES:
-                # Memastikan input dan output tidak kosong
-                if not item["input_text"] or not item["output_text"]:
-                    print(f"PERINGATAN: Melewatkan data kosong: {item}")
+            for sample, reason in _process_lines(iter_source_lines([])):
+                if sample is None:
+                    print(f"PERINGATAN: Melewatkan data tidak valid ({reason})")
                     continue
-                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+                f.write(json.dumps(sample, ensure_ascii=False) + '\n')
+                total += 1
         
         print(f"Dataset berhasil dibuat di '{output_path}'")
-        print(f"Total contoh percakapan: {len(CONVERSATION_SAMPLES)}")
+        print(f"Total contoh percakapan: {total}")
         
     except Exception as e:
         print(f"Terjadi kesalahan: {e}")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Membangun dataset fine-tuning dari CONVERSATION_SAMPLES dan log percakapan.")
+    parser.add_argument("logs", nargs="*", help="File log JSONL (boleh .gz), misalnya hasil CONVERSATION_LOG_DIR")
+    parser.add_argument("--output-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "shards"))
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--eval-percent", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses (default: semua core, 1 = tanpa multiprocessing)")
+    parser.add_argument("--append", action="store_true", help="Lanjutkan indeks dedupe dan tambahkan ke shard yang ada")
+    args = parser.parse_args()
+
+    # Tanpa file log: perilaku lama, tulis dataset_yunita.jsonl dari CONVERSATION_SAMPLES
+    if not args.logs:
+        create_dataset_file()
+        return
+
+    stats = build_dataset(args.logs, args.output_dir, args.shards, args.eval_percent, args.workers, args.append)
+    print(f"Dataset shard berhasil dibuat di '{args.output_dir}'")
+    print(f"Dibaca: {stats['dibaca']}, ditulis: {stats['ditulis']}, duplikat: {stats['duplikat']}, ditolak: {stats['ditolak']}")
+
+
 if __name__ == "__main__":
-    create_dataset_file()
\ No newline at end of file
+    main()
@@ -30,7 +30,27 @@ document.addEventListener('DOMContentLoaded', () => {
     let userName = '';
     let currentLanguage = 'en';
     let chatHistory = [];
+    // Lets the backend keep this conversation's medication profile between turns
+    const sessionId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
     const backendUrl = 'http://127.0.0.1:8000';
+    let assetVersions = {};
+
+    // --- ASSET VERSIONS ---
+    // When the page is served by the backend, versioned image URLs (?v=<hash>) are cached
+    // as immutable, and the avatars are preloaded so emotion switches never hit the network.
+    const AVATARS = ['neutral', 'happy', 'blushing', 'concerned'];
+    fetch('asset-versions')
+        .then(response => response.ok ? response.json() : {})
+        .then(versions => {
+            assetVersions = versions;
+            AVATARS.forEach(name => { new Image().src = assetUrl(`images/${name}.png`); });
+        })
+        .catch(() => {});
+
+    function assetUrl(path) {
+        const version = assetVersions[path];
+        return version ? `${path}?v=${version}` : path;
+    }
 
     // --- INITIAL ANIMATION ---
     if(loginCard) loginCard.classList.add('pop-out-enter');
@@ -76,12 +96,18 @@ document.addEventListener('DOMContentLoaded', () => {
                     message: introMsg, 
                     history: [],
                     language: currentLanguage,
-                    userName: userName
+                    userName: userName,
+                    sessionId: sessionId
                 }),
             });
 
-            if (!response.ok) throw new Error("Network Error");
+            // 503 = server busy; the body still carries a message for the user
+            if (!response.ok && response.status !== 503) throw new Error("Network Error");
             const data = await response.json();
+            const busy = response.status === 503;
+
+            // The intro went unanswered; drop it so the next request starts clean
+            if (busy) chatHistory.pop();
 
             // Hide Loading -> Show Chat
             loadingScreen.classList.add('hidden');
@@ -94,9 +120,10 @@ document.addEventListener('DOMContentLoaded', () => {
             if(chatInterface) chatInterface.classList.add('pop-out-enter');
 
             // Display Karin's Response
+            // Busy replies are shown but never recorded as Karin's turns
             for (const msg of data.messages) {
                 appendMessage('karin', msg);
-                chatHistory.push({ "role": "model", "parts": [msg] });
+                if (!busy) chatHistory.push({ "role": "model", "parts": [msg] });
             }
             updateKarinImage(data.emotion);
 
@@ -128,18 +155,25 @@ document.addEventListener('DOMContentLoaded', () => {
                     message: messageText,
                     history: chatHistory.slice(0, -1),
                     language: currentLanguage,
-                    userName: userName
+                    userName: userName,
+                    sessionId: sessionId
                 }),
             });
 
+            // 503 = server busy: show the message, but drop the unanswered question so a retry is clean
+            if (!response.ok && response.status !== 503) throw new Error("Network Error");
             const data = await response.json();
+            const busy = response.status === 503;
+            if (busy) chatHistory.pop();
+
             for (const msg of data.messages) {
                 appendMessage('karin', msg);
-                chatHistory.push({ "role": "model", "parts": [msg] });
+                if (!busy) chatHistory.push({ "role": "model", "parts": [msg] });
             }
             updateKarinImage(data.emotion);
 
         } catch (error) {
+            chatHistory.pop();
             appendMessage('karin', "Error connecting to server.");
         } finally {
             userInput.disabled = false;
@@ -208,7 +242,7 @@ document.addEventListener('DOMContentLoaded', () => {
     function updateKarinImage(emotion) {
         const valid = ['neutral', 'happy', 'blushing', 'concerned', 'curious'];
         const imgName = valid.includes(emotion) ? emotion : 'neutral';
-        if(karinImage) karinImage.src = `images/${imgName}.png`;
+        if(karinImage) karinImage.src = assetUrl(`images/${imgName}.png`);
     }
 
     // --- EVENT LISTENERS ---